@@ -1,14 +1,16 @@
 import binaryninja as bn
 
-from .architecutre import V850Architecture, V850ESArchitecture, V850E2MArchitecture
+from .architecutre import V850Architecture, V850ESArchitecture, V850E2MArchitecture, RH850Architecture
 
 V850Architecture.register()
 V850ESArchitecture.register()
 V850E2MArchitecture.register()
+RH850Architecture.register()
 
 v850: bn.Architecture = bn.Architecture["v850"]
 v850es: bn.Architecture = bn.Architecture["v850es"]
 v850e2m: bn.Architecture = bn.Architecture["v850e2m"]
+rh850: bn.Architecture = bn.Architecture["rh850"]
 
 #bn.BinaryViewType["ELF"].register_arch(29925, bn.Endianness.LittleEndian, v850e2m)
 #bn.BinaryViewType["ELF"].register_arch(29814, bn.Endianness.LittleEndian, v850es)
@@ -24,6 +26,14 @@ class V850CallingConvention(bn.CallingConvention):
     callee_saved_regs = ["gp", "r25"]
 
 
+class RH850CallingConvention(bn.CallingConvention):
+    int_arg_regs = ["r6", "r7", "r8", "r9"]
+    int_return_reg = "r10"
+    high_int_return_reg = "r11"
+    callee_saved_regs = ["r%d" % i for i in range(20, 30)]
+
+
 v850.register_calling_convention(V850CallingConvention(v850, "default"))
 v850es.register_calling_convention(V850CallingConvention(v850es, "default"))
 v850e2m.register_calling_convention(V850CallingConvention(v850e2m, "default"))
+rh850.register_calling_convention(RH850CallingConvention(rh850, "default"))
@@ -1,11 +1,66 @@
+from functools import partial
 from typing import Optional, Tuple, List
 
 import binaryninja as bn
 
-from .opcode_table import decode
+from .cache import LRUCache
+from .opcode_table import decode_cached, cache_key, classify, code_size, decode_errors
 from .enums import MNEM, REG, SREG_V850, SREG_V850E2M, SREG_V850ES, SREG_RH850, USER_FLAG, COND, Subarch
+from .enums import FCOND, CACHEOP, PREFOP, BRANCH
 from .operand import *
-from .lifter import choose_lifter, V850Lifter
+from .lifter import choose_lifter, V850Lifter, fp_intrinsics, fp_types
+
+
+T = bn.InstructionTextTokenType
+
+
+def enum_tokens(enum, token_type=T.RegisterToken):
+    """ one token per member of enum, indexed by value """
+    table = [None] * (max(enum) + 1)
+    for member in enum:
+        table[member] = bn.InstructionTextToken(token_type, member.name.lower())
+    return table
+
+
+# the tokens shared by all rendered instructions, tokens are only read when passed to the core
+separator_token = bn.InstructionTextToken(T.OperandSeparatorToken, ", ")
+mem_begin_token = bn.InstructionTextToken(T.BeginMemoryOperandToken, "[")
+mem_end_token = bn.InstructionTextToken(T.EndMemoryOperandToken, "]")
+list_begin_token = bn.InstructionTextToken(T.TextToken, "[")
+list_end_token = bn.InstructionTextToken(T.TextToken, "]")
+list_separator_token = bn.InstructionTextToken(T.TextToken, ", ")
+pair_separator_token = bn.InstructionTextToken(T.OperandSeparatorToken, " || ")
+range_separator_token = bn.InstructionTextToken(T.OperandSeparatorToken, "-")
+vector_token = bn.InstructionTextToken(T.TextToken, "vector:")
+
+# tokens of the EnumOperand values by enum class
+operand_enum_tokens = {enum: enum_tokens(enum) for enum in (REG, COND, FCOND, CACHEOP, PREFOP)}
+reg_tokens = operand_enum_tokens[REG]
+
+# [reg] by REG value
+reg_mem_tokens = [(mem_begin_token, token, mem_end_token) for token in reg_tokens]
+
+
+def mnemonic_tokens(enum, fmt):
+    """ the mnemonic token of each member of enum as a one token tuple, indexed by value """
+    table = [None] * (max(enum) + 1)
+    for member in enum:
+        table[member] = (bn.InstructionTextToken(T.InstructionToken, fmt % member.name.replace("_", ".").lower()),)
+    return table
+
+
+# the mnemonic of each MNEM, B by condition as the condition is part of its mnemonic
+mnem_tokens = mnemonic_tokens(MNEM, "%s ")
+b_mnem_tokens = mnemonic_tokens(COND, "b%s ")
+
+
+def branch_target_token(addr, disp):
+    return bn.InstructionTextToken(T.PossibleAddressToken, "%.8x" % ((addr + disp) & 0xffffffff))
+
+
+# rendered instructions by (subarch, instruction bytes): (tokens, length, ((token index, RelJump displacement), ...))
+# the tokens of the branch targets are the only ones depending on the address, they are rebuilt on every hit
+text_cache = LRUCache(maxsize=0x4000)
 
 
 class OperandToText(Operand.Visitor):
@@ -13,78 +68,53 @@ class OperandToText(Operand.Visitor):
         self.addr = addr
 
     def visit_Operand(self, op):
-        return [bn.InstructionTextToken(bn.InstructionTextTokenType.TextToken, "%s<%s>" % (type(op).__name__, op))]
+        return [bn.InstructionTextToken(T.TextToken, "%s<%s>" % (type(op).__name__, op))]
 
     def visit_EnumOperand(self, op):
-        return [bn.InstructionTextToken(bn.InstructionTextTokenType.RegisterToken, "%s" % (op.val.name.lower()))]
+        return (operand_enum_tokens[op.enum_class][op.val],)
 
     def visit_Imm(self, op):
-        return [bn.InstructionTextToken(bn.InstructionTextTokenType.IntegerToken, op.fmt % int(op))]
+        return [bn.InstructionTextToken(T.IntegerToken, op.fmt % int(op))]
 
     def visit_RelJump(self, op):
-        return [
-            bn.InstructionTextToken(bn.InstructionTextTokenType.PossibleAddressToken, "%.8x" % (int(op + self.addr)))]
+        return [branch_target_token(self.addr, int(op))]
 
     def visit_RegJump(self, op):
-        return [bn.InstructionTextToken(bn.InstructionTextTokenType.BeginMemoryOperandToken, "["),
-                bn.InstructionTextToken(bn.InstructionTextTokenType.RegisterToken, "%s" % op.val.name.lower()),
-                bn.InstructionTextToken(bn.InstructionTextTokenType.EndMemoryOperandToken, "]"),
-                ]
+        return reg_mem_tokens[op.val]
 
     def visit_VecJump(self, op):
-        return [bn.InstructionTextToken(bn.InstructionTextTokenType.TextToken, "vector:"),
-                bn.InstructionTextToken(bn.InstructionTextTokenType.IntegerToken, "%d" % int(op)),
-                ]
+        return [vector_token, bn.InstructionTextToken(T.IntegerToken, "%d" % int(op))]
 
     def visit_RegMem(self, op):
-        return [bn.InstructionTextToken(bn.InstructionTextTokenType.BeginMemoryOperandToken, "["),
-                bn.InstructionTextToken(bn.InstructionTextTokenType.RegisterToken, "%s" % op.val.name.lower()),
-                bn.InstructionTextToken(bn.InstructionTextTokenType.EndMemoryOperandToken, "]"),
-                ]
+        return reg_mem_tokens[op.val]
 
     def visit_Displacement(self, op):
         if op.base == REG.R0:
-            token_type = bn.InstructionTextTokenType.PossibleAddressToken
-        else:
-            token_type = bn.InstructionTextTokenType.IntegerToken
-        ret = []
-        if op.base == REG.R0 or int(op.disp) != 0:
-            ret += [bn.InstructionTextToken(token_type, op.disp.fmt % int(op.disp))]
-        if op.base != REG.R0:
-            ret += [bn.InstructionTextToken(bn.InstructionTextTokenType.BeginMemoryOperandToken, "["),
-                    bn.InstructionTextToken(bn.InstructionTextTokenType.RegisterToken, "%s" % op.base.name.lower()),
-                    bn.InstructionTextToken(bn.InstructionTextTokenType.OperandSeparatorToken, "]")]
-        return ret
+            return [bn.InstructionTextToken(T.PossibleAddressToken, op.disp.fmt % int(op.disp))]
+        if int(op.disp) != 0:
+            return [bn.InstructionTextToken(T.IntegerToken, op.disp.fmt % int(op.disp))] + \
+                   list(reg_mem_tokens[op.base])
+        return reg_mem_tokens[op.base]
 
     def visit_BitMem(self, op):
-        ret = [bn.InstructionTextToken(bn.InstructionTextTokenType.IntegerToken, "#%d" % op.index),
-               bn.InstructionTextToken(bn.InstructionTextTokenType.OperandSeparatorToken, ", ")]
+        ret = [bn.InstructionTextToken(T.IntegerToken, "#%d" % op.index), separator_token]
         ret += self.visit_Displacement(op)
         return ret
 
     def visit_RegList(self, op):
-        ret = [bn.InstructionTextToken(bn.InstructionTextTokenType.TextToken, "[")]
-        first = True
+        ret = [list_begin_token]
         for reg in op:
-            if not first:
-                ret.append(bn.InstructionTextToken(bn.InstructionTextTokenType.TextToken, ", "))
-            else:
-                first = False
-            ret.append(bn.InstructionTextToken(bn.InstructionTextTokenType.RegisterToken, "%s" % reg.name.lower()))
-        ret.append(bn.InstructionTextToken(bn.InstructionTextTokenType.TextToken, "]"))
+            ret += (reg_tokens[reg], list_separator_token)
+        if len(ret) > 1:
+            ret.pop()
+        ret.append(list_end_token)
         return ret
 
-    def visit_RegPair(self, op, addr):
-        return [bn.InstructionTextToken(bn.InstructionTextTokenType.RegisterToken, op.reg_hi),
-                bn.InstructionTextToken(bn.InstructionTextTokenType.OperandSeparatorToken, " || "),
-                bn.InstructionTextToken(bn.InstructionTextTokenType.RegisterToken, op.reg_lo),
-                ]
+    def visit_RegPair(self, op):
+        return reg_tokens[op.reg_hi], pair_separator_token, reg_tokens[op.reg_lo]
 
-    def visit_RegRange(self, op, addr):
-        return [bn.InstructionTextToken(bn.InstructionTextTokenType.RegisterToken, op.reg_hi),
-                bn.InstructionTextToken(bn.InstructionTextTokenType.OperandSeparatorToken, "-"),
-                bn.InstructionTextToken(bn.InstructionTextTokenType.RegisterToken, op.reg_lo)
-                ]
+    def visit_RegRange(self, op):
+        return reg_tokens[op.start], range_separator_token, reg_tokens[op.stop]
 
 
 v850_gpregs = {
@@ -142,88 +172,98 @@ class V850Architecture(bn.Architecture):
         bn.LowLevelILFlagCondition.LLFC_O: ["ov"],
     }
 
+    # resolved once by register(): the Subarch, the decoders bound to it and the lifter of the instance
+    subarch = None
+    decode = None
+    classify = None
+    lifter = None
+
+    @classmethod
+    def register(cls):
+        cls.subarch = Subarch[cls.name.upper()]
+        cls.decode = staticmethod(partial(decode_cached, subarch=cls.subarch))
+        cls.classify = staticmethod(partial(classify, subarch=cls.subarch))
+        super().register()
+
+    def __init__(self):
+        super().__init__()
+        self.lifter = choose_lifter(self.subarch)(self)
+
     def get_instruction_info(self, data: bytes, addr: int) -> Optional[bn.InstructionInfo]:
-        subarch = Subarch[self.name.upper()]
-        mnem, operands, length = decode(data, subarch=subarch)
-        if mnem == MNEM.INVALID_CODE or mnem == MNEM.UNDEF_CODE:
+        length, branch, target = self.classify(data)
+        if not length:
             return None
         info = bn.InstructionInfo()
-        info.length = length * 2
-        if mnem == MNEM.JMP:
-            op = operands[0]
-            if isinstance(op, RegJump):
-                if op.val == REG.R0:
-                    info.add_branch(bn.BranchType.UnconditionalBranch, 0)
-                elif op.val == REG.LP:
-                    info.add_branch(bn.BranchType.FunctionReturn)
-                else:
-                    info.add_branch(bn.BranchType.UnresolvedBranch)
-            elif isinstance(op, BasedJump):
-                if op.base == REG.R0:
-                    info.add_branch(bn.BranchType.UnconditionalBranch, int(op.disp))
-                else:
-                    info.add_branch(bn.BranchType.UnresolvedBranch)
-        elif mnem == MNEM.JR:
-            op = operands[0]
-            if isinstance(op, RelJump):
-                info.add_branch(bn.BranchType.UnconditionalBranch, addr + int(op))
-        elif mnem == MNEM.JARL:
-            op = operands[0]
-            if isinstance(op, RelJump):
-                if operands[1].val == REG.LP:
-                    info.add_branch(bn.BranchType.CallDestination, addr + int(op))
-                else:
-                    info.add_branch(bn.BranchType.UnconditionalBranch, addr + int(op))
-        elif mnem == MNEM.B:
-            op = operands[1]
-            if isinstance(op, RelJump):
-                info.add_branch(bn.BranchType.TrueBranch, addr + int(op))
-                if operands[0].val != COND.R:
-                    info.add_branch(bn.BranchType.FalseBranch, addr + length * 2)
-        elif mnem == MNEM.SWITCH:
-            info.add_branch(bn.BranchType.UserDefinedBranch)
-        elif mnem == MNEM.CALLT:
-            info.add_branch(bn.BranchType.UserDefinedBranch)
-        elif mnem == MNEM.SYSCALL:
+        info.length = length
+        if branch == BRANCH.NONE:
+            return info
+        if branch == BRANCH.JUMP:
+            info.add_branch(bn.BranchType.UnconditionalBranch, target)
+        elif branch == BRANCH.JUMP_REL:
+            info.add_branch(bn.BranchType.UnconditionalBranch, addr + target)
+        elif branch == BRANCH.CALL_REL:
+            info.add_branch(bn.BranchType.CallDestination, addr + target)
+        elif branch == BRANCH.COND_REL:
+            info.add_branch(bn.BranchType.TrueBranch, addr + target)
+            info.add_branch(bn.BranchType.FalseBranch, addr + length)
+        elif branch == BRANCH.UNRESOLVED:
+            # SWITCH targets are reported as indirect branches after analysis, see resolvers.queue_indirect_branches
+            info.add_branch(bn.BranchType.UnresolvedBranch)
+        elif branch == BRANCH.RETURN:
+            info.add_branch(bn.BranchType.FunctionReturn)
+        elif branch == BRANCH.SYSCALL:
             info.add_branch(bn.BranchType.SystemCall)
-        elif mnem in [MNEM.DBTRAP, MNEM.TRAP, MNEM.FETRAP, MNEM.RIE, MNEM.HALT]:
+        elif branch == BRANCH.EXCEPTION:
             info.add_branch(bn.BranchType.ExceptionBranch)
-        elif mnem in [MNEM.RETI, MNEM.DBRET, MNEM.FERET, MNEM.EIRET, MNEM.CTRET]:
-            info.add_branch(bn.BranchType.FunctionReturn)
-        elif mnem == MNEM.DISPOSE:
-            if len(operands) == 3:
-                if operands[2].val == REG.LP:
-                    info.add_branch(bn.BranchType.FunctionReturn)
-                else:
-                    info.add_branch(bn.BranchType.UnresolvedBranch)
         return info
 
     def get_instruction_text(self, data: bytes, addr: int) -> Tuple[List['bn.function.InstructionTextToken'], int]:
-        subarch = Subarch[self.name.upper()]
-        mnem, operands, length = decode(data, subarch=subarch)
-        mnemonic = mnem.name.replace("_", ".").lower()
-        if mnemonic == "b":
-            cond = operands.pop(0)
-            mnemonic += cond.val.name.lower()
-        ret = [bn.InstructionTextToken(bn.InstructionTextTokenType.InstructionToken, "%s " % mnemonic)]
-        first = True
+        key = cache_key(data, self.subarch)
+        cached = text_cache.get(key)
+        if cached is not None:
+            tokens, length, targets = cached
+            ret = list(tokens)
+            for i, disp in targets:
+                ret[i] = branch_target_token(addr, disp)
+            return ret, length
+        insn = self.decode(data)
+        operands = insn.operands
+        if insn.mnem == MNEM.B:
+            ret = list(b_mnem_tokens[operands[0].val])
+            operands = operands[1:]
+        else:
+            ret = list(mnem_tokens[insn.mnem])
         vis = OperandToText(addr)
-        for op in operands:
-            if first:
-                first = False
-            else:
-                ret.append(bn.InstructionTextToken(bn.InstructionTextTokenType.OperandSeparatorToken, ", "))
+        targets = []
+        for i, op in enumerate(operands):
+            if i:
+                ret.append(separator_token)
+            if type(op) is RelJump:
+                targets.append((len(ret), int(op)))
             ret += op.accept(vis)
-        return ret, length * 2
+        text_cache.put(key, (tuple(ret), insn.length * 2, tuple(targets)))
+        return ret, insn.length * 2
 
     def get_instruction_low_level_il(self, data: bytes, addr: int, il: 'bn.lowlevelil.LowLevelILFunction') -> int:
-        subarch = Subarch[self.name.upper()]
-        mnem, operands, length = decode(data, subarch=subarch)
-        if mnem == MNEM.INVALID_CODE or mnem == MNEM.UNDEF_CODE:
+        insn = self.decode(data)
+        if insn.mnem == MNEM.INVALID_CODE or insn.mnem == MNEM.UNDEF_CODE:
             return None
-        lifter = choose_lifter(subarch)(self)
-        if not lifter.process_instruction(mnem, operands, length, addr, il):
-            return length * 2
+        lifter = self.lifter
+        if lifter.fusion and insn.mnem in lifter.fuse_handlers:
+            size = insn.length * 2
+            nxt = None
+            # only look ahead at a next instruction whose bytes are all in data, a failed decode lifts insn alone
+            if len(data) >= size + 2 and len(data) >= size + code_size[int.from_bytes(data[size:size + 2], "little")]:
+                try:
+                    nxt = self.decode(data[size:])
+                except decode_errors:
+                    nxt = None
+            if nxt is not None and size + nxt.length * 2 <= len(data):
+                consumed = lifter.process_pair(insn, nxt, addr, il)
+                if consumed:
+                    return consumed
+        if not lifter.process_instruction(insn, addr, il):
+            return insn.length * 2
 
 
 v850es_regs = dict(v850_gpregs)
@@ -264,6 +304,22 @@ v850e2m_intrinsics.update(
 )
 
 
+def fp_intrinsic_type(t):
+    size, is_float = fp_types[t]
+    return bn.Type.float(size) if is_float else bn.Type.int(size, sign=not t.startswith("U"))
+
+
+# the unsigned 64 bit conversions, 8 byte results are returned in the (hi, lo) register pair
+v850e2m_intrinsics.update(
+    {
+        name: bn.IntrinsicInfo([bn.IntrinsicInput(fp_intrinsic_type(src), "src")],
+                               [bn.Type.int(4, sign=False)] * 2 if fp_types[dst][0] == 8 else
+                               [fp_intrinsic_type(dst)])
+        for name, (src, dst) in fp_intrinsics.items()
+    }
+)
+
+
 class V850E2MArchitecture(V850Architecture):
     name = 'v850e2m'
     regs = v850e2_regs
@@ -276,6 +332,21 @@ rh850_regs.update(
 )
 
 
+rh850_intrinsics = dict(v850e2m_intrinsics)
+rh850_intrinsics.update(
+    {
+        'cll': bn.IntrinsicInfo([], []),
+        'snooze': bn.IntrinsicInfo([], []),
+        'synci': bn.IntrinsicInfo([], []),
+        'cache': bn.IntrinsicInfo([bn.IntrinsicInput(bn.Type.int(1), "op"), bn.IntrinsicInput(bn.Type.int(4), "addr")],
+                                  []),
+        'pref': bn.IntrinsicInfo([bn.IntrinsicInput(bn.Type.int(1), "op"), bn.IntrinsicInput(bn.Type.int(4), "addr")],
+                                 []),
+    }
+)
+
+
 class RH850Architecture(V850E2MArchitecture):
     name = 'rh850'
     regs = rh850_regs
+    intrinsics = rh850_intrinsics
@@ -0,0 +1,419 @@
+"""
+Micro benchmarks for the hot paths of the plugin.
+
+Run them from the Binary Ninja python console (or anywhere the binaryninja API is importable):
+
+    >>> from binja_v850 import bench
+    >>> bench.main()
+"""
+import random
+import timeit
+import tracemalloc
+
+from . import opcode_formats, opcode_table
+from .enums import MNEM, REG, Subarch
+from .visitor import Visitable
+
+
+def report(name, seconds, count):
+    print("%-48s %10.1f ns/op" % (name, seconds * 1e9 / count))
+
+
+def timed(stmt, number, **ns):
+    return min(timeit.repeat(stmt, globals=ns, number=number, repeat=3))
+
+
+def legacy_bitfield(hi, lo=0, ret_type=int):
+    """ the property based field accessor the compiled BitFields replaced """
+    mask = (1 << (hi - lo + 1)) - 1
+
+    def getter(self):
+        return ret_type((int(self) >> lo) & mask)
+
+    return property(fget=getter)
+
+
+class LegacyFormatVI(int):
+    reg1 = legacy_bitfield(4, 0, ret_type=REG)
+    reg2 = legacy_bitfield(15, 11, ret_type=REG)
+    _imm_lo = legacy_bitfield(31, 16)
+    _imm_hi = legacy_bitfield(47, 32)
+
+    @property
+    def imm32(self):
+        return self._imm_hi << 16 | self._imm_lo
+
+
+class LegacyFormatV(int):
+    reg2 = legacy_bitfield(15, 11, ret_type=REG)
+    _disp_hi = legacy_bitfield(5, 0)
+    _disp_lo = legacy_bitfield(31, 16)
+
+    @property
+    def disp22(self):
+        return self._disp_hi << 16 | self._disp_lo
+
+
+def bench_bitfields(number=200000):
+    code = 0x123456789abc
+    cases = [
+        ("FormatVI reg1, reg2, imm32", "f.reg1, f.reg2, f.imm32",
+         LegacyFormatVI(code), opcode_formats.FormatVI(code)),
+        ("FormatV reg2, disp22", "f.reg2, f.disp22",
+         LegacyFormatV(code), opcode_formats.FormatV(code)),
+    ]
+    for name, stmt, legacy, compiled in cases:
+        report("bitfield property  " + name, timed(stmt, number, f=legacy), number)
+        report("bitfield compiled  " + name, timed(stmt, number, f=compiled), number)
+    unpack = opcode_formats.FormatVI.unpack
+    report("bitfield unpack    FormatVI", timed("unpack(code)", number, unpack=unpack, code=code), number)
+
+
+def legacy_bs2int(bs: bytes, endianess=0) -> int:
+    """ the padding byte-by-byte conversion the decoder used before """
+    bs = (bs + b"\x00" * 8)[:8]
+    indices = range(8)
+    if not endianess:
+        indices = reversed(indices)
+    r = 0
+    for i in indices:
+        r <<= 8
+        r |= bs[i]
+    return r
+
+
+def bench_bs2int(number=200000):
+    data = bytes.fromhex("0a0a3412f8ff0000")  # mov 10, r1 followed by garbage
+    for n in (2, 4, 8):
+        bs = data[:n]
+        report("bs2int legacy      %d bytes" % n, timed("f(bs)", number, f=legacy_bs2int, bs=bs), number)
+        report("bs2int             %d bytes" % n, timed("f(bs)", number, f=opcode_table.bs2int, bs=bs), number)
+    view = memoryview(bytearray(data))
+    report("bs2int             memoryview", timed("f(bs)", number, f=opcode_table.bs2int, bs=view), number)
+    size = opcode_table.code_size
+    report("first halfword + code size   16-bit insn",
+           timed("size[int.from_bytes(bs[:2], 'little')]", number, size=size, bs=data), number)
+
+
+def instruction_stream(count=100000, seed=850):
+    """ a reproducible buffer of `count` random encodings, roughly half of them 16-bit """
+    rnd = random.Random(seed)
+    parts = []
+    for _ in range(count):
+        parts.append(rnd.getrandbits(64).to_bytes(8, "little")[:rnd.choice([2, 2, 4, 6])])
+    return b"".join(parts)
+
+
+def bench_operand_allocations(count=100000, subarch=Subarch.V850E2M):
+    """ operand objects and memory kept alive by decoding a large instruction stream """
+    data = instruction_stream(count)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    insns = [insn for insn in (decode_or_none(data[off:off + 8], subarch) for off in range(0, len(data) - 1, 2))
+             if insn is not None]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    blocks = sum(st.count_diff for st in stats)
+    size = sum(st.size_diff for st in stats)
+    operands = [op for insn in insns for op in insn.operands]
+    print("%-48s %10d" % ("decoded instructions", len(insns)))
+    print("%-48s %10d" % ("operands", len(operands)))
+    print("%-48s %10d" % ("distinct operand objects", len({id(op) for op in operands})))
+    print("%-48s %10d" % ("allocated blocks", blocks))
+    print("%-48s %10.1f" % ("allocated KiB", size / 1024))
+
+
+def decode_or_none(bs, subarch):
+    try:
+        return opcode_table.decode(bs, subarch=subarch)
+    except Exception:
+        return None
+
+
+def bench_classify(count=50000, subarch=Subarch.V850E2M):
+    """ get_instruction_info's view of an instruction stream: full decode against classify() """
+    data = instruction_stream(count)
+    offsets = [off for off in range(0, len(data) - 8, 2) if decode_or_none(data[off:off + 8], subarch) is not None]
+    for name, f in (("decode_cached", opcode_table.decode_cached), ("classify", opcode_table.classify)):
+        opcode_table.decode_cache.clear()
+        opcode_table.classify_cache.clear()
+        seconds = timed("for off in offsets: f(data[off:off + 8], subarch)", 1,
+                        f=f, data=data, offsets=offsets, subarch=subarch)
+        report("instruction info   " + name, seconds, len(offsets))
+
+
+def legacy_accept(op, vis, *args, **kwargs):
+    """ Visitable.accept before the visit methods were cached """
+    meth = None
+    for c in reversed(op.__class__.mro()):
+        if issubclass(c, Visitable):
+            meth = c.get_visit_method(vis, meth)
+    if meth:
+        return meth(op, *args, **kwargs)
+    else:
+        return NotImplemented
+
+
+def bench_visitors(number=100000):
+    import binaryninja as bn
+    from .architecutre import OperandToText
+    from .lifter import OperandGet
+
+    arch = bn.Architecture["v850e2m"]
+    il = bn.LowLevelILFunction(arch)
+    ops = opcode_table.decode(bytes.fromhex("21171100")).operands  # ld.w 16[r1], r2
+    ops += opcode_table.decode(bytes.fromhex("0a0a0000")).operands  # mov 10, r1
+    text, getter = OperandToText(0), OperandGet(0)
+    cases = [
+        ("OperandToText", "for op in ops: accept(op, vis)", dict(vis=text)),
+        ("OperandGet", "for op in ops: accept(op, vis, il, size=4)", dict(vis=getter, il=il)),
+    ]
+    for name, stmt, ns in cases:
+        report("accept legacy      %s per operand" % name,
+               timed(stmt, number, ops=ops, accept=legacy_accept, **ns), number * len(ops))
+        report("accept cached      %s per operand" % name,
+               timed(stmt, number, ops=ops, accept=Visitable.accept, **ns), number * len(ops))
+
+
+def legacy_lift_add(operands, addr, il):
+    """ the visitor based lift_ADD / lift_ADDI the generated ALU lifters replaced """
+    from .lifter import OperandGet, OperandSet
+    src0, src1, dst = operands[0], operands[-2], operands[-1]
+    getter = OperandGet(addr)
+    val0 = src0.accept(getter, il, size=4)
+    val1 = src1.accept(getter, il, size=4)
+    exp = il.add(4, val0, val1, flags="nosat")
+    setter = OperandSet(addr)
+    dst.accept(setter, il, exp, size=4)
+
+
+def bench_lift_alu(number=20000):
+    import binaryninja as bn
+
+    arch = bn.Architecture["v850e2m"]
+    lifter = arch.lifter
+    cases = [
+        ("add r1, r2", "c111"),
+        ("add 5, r2", "4512"),
+        ("addi 16, r1, r2", "01161000"),
+    ]
+    for name, code in cases:
+        insn = opcode_table.decode(bytes.fromhex(code))
+        il = bn.LowLevelILFunction(arch)
+        report("lift legacy        " + name,
+               timed("lift(ops, 0, il)", number, lift=legacy_lift_add, ops=insn.operands, il=il), number)
+        il = bn.LowLevelILFunction(arch)
+        report("lift generated     " + name,
+               timed("lift(insn, 0, il)", number, lift=lifter.process_instruction, insn=insn, il=il), number)
+
+
+def legacy_lift_load(operands, addr, il, size=4, signed=True):
+    """ the visitor based lift_LD the load/store tables replaced """
+    from .lifter import OperandGet, OperandSet
+    src, dst = operands
+    val = src.accept(OperandGet(addr), il, size=size)
+    if size < 4:
+        val = il.sign_extend(4, val) if signed else il.zero_extend(4, val)
+    dst.accept(OperandSet(addr), il, val, 4)
+
+
+def bench_lift_mem(number=20000):
+    import binaryninja as bn
+
+    arch = bn.Architecture["v850e2m"]
+    lifter = arch.lifter
+    cases = [
+        ("ld.w 16[r1], r2", "21171100", 4, True),
+        ("ld.b -4[r0], r2", "0017fcff", 1, True),
+        ("sld.hu 6[ep], r2", "7310", 2, False),
+    ]
+    for name, code, size, signed in cases:
+        insn = opcode_table.decode(bytes.fromhex(code))
+        il = bn.LowLevelILFunction(arch)
+        report("lift legacy        " + name,
+               timed("lift(ops, 0, il, size, signed)", number, lift=legacy_lift_load, ops=insn.operands, il=il,
+                     size=size, signed=signed), number)
+        il = bn.LowLevelILFunction(arch)
+        report("lift tables        " + name,
+               timed("lift(insn, 0, il)", number, lift=lifter.process_instruction, insn=insn, il=il), number)
+
+
+def legacy_operand_text():
+    """ OperandToText before the token templates, building every token per call """
+    import binaryninja as bn
+    from .architecutre import OperandToText
+
+    T = bn.InstructionTextTokenType
+
+    class LegacyOperandToText(OperandToText):
+        def visit_EnumOperand(self, op):
+            return [bn.InstructionTextToken(T.RegisterToken, "%s" % (op.val.name.lower()))]
+
+        def visit_RegMem(self, op):
+            return [bn.InstructionTextToken(T.BeginMemoryOperandToken, "["),
+                    bn.InstructionTextToken(T.RegisterToken, "%s" % op.val.name.lower()),
+                    bn.InstructionTextToken(T.EndMemoryOperandToken, "]")]
+
+        visit_RegJump = visit_RegMem
+
+        def visit_Displacement(self, op):
+            token_type = T.PossibleAddressToken if op.base == REG.R0 else T.IntegerToken
+            ret = []
+            if op.base == REG.R0 or int(op.disp) != 0:
+                ret += [bn.InstructionTextToken(token_type, op.disp.fmt % int(op.disp))]
+            if op.base != REG.R0:
+                ret += [bn.InstructionTextToken(T.BeginMemoryOperandToken, "["),
+                        bn.InstructionTextToken(T.RegisterToken, "%s" % op.base.name.lower()),
+                        bn.InstructionTextToken(T.EndMemoryOperandToken, "]")]
+            return ret
+
+    def instruction_text(data, addr, subarch):
+        insn = opcode_table.decode_cached(data, subarch=subarch)
+        operands = insn.operands
+        mnemonic = insn.mnem.name.replace("_", ".").lower()
+        if mnemonic == "b":
+            cond, operands = operands[0], operands[1:]
+            mnemonic += cond.val.name.lower()
+        ret = [bn.InstructionTextToken(T.InstructionToken, "%s " % mnemonic)]
+        vis = LegacyOperandToText(addr)
+        for i, op in enumerate(operands):
+            if i:
+                ret.append(bn.InstructionTextToken(T.OperandSeparatorToken, ", "))
+            ret += op.accept(vis)
+        return ret, insn.length * 2
+
+    return instruction_text
+
+
+def bench_render(count=20000, subarch=Subarch.V850E2M):
+    """ lines per second of get_instruction_text over a decoded instruction stream """
+    import binaryninja as bn
+    from .architecutre import text_cache
+
+    arch = bn.Architecture[subarch.name.lower()]
+    data = instruction_stream(count)
+    lines = []
+    off = 0
+    while off < len(data) - 8:
+        insn = decode_or_none(data[off:off + 8], subarch)
+        if insn is None or not insn.length:
+            off += 2
+            continue
+        lines.append((data[off:off + 8], off))
+        off += insn.length * 2
+    legacy = legacy_operand_text()
+    text_cache.resize(0)
+    cases = [
+        ("render legacy      linear view", "for bs, addr in lines: text(bs, addr, subarch)",
+         dict(text=legacy, subarch=subarch)),
+        ("render templates   linear view", "for bs, addr in lines: text(bs, addr)",
+         dict(text=arch.get_instruction_text)),
+    ]
+    for name, stmt, ns in cases:
+        seconds = timed(stmt, 1, lines=lines, **ns)
+        print("%-48s %10.0f lines/s" % (name, len(lines) / seconds))
+    # scrolling over the same view again: after the first repetition every line is a hit
+    text_cache.clear()
+    text_cache.resize(len(lines))
+    seconds = timed("for bs, addr in lines: text(bs, addr)", 1, lines=lines, text=arch.get_instruction_text)
+    print("%-48s %10.0f lines/s" % ("render cached      linear view", len(lines) / seconds))
+    print("%-48s %10.1f %%" % ("text cache hit rate", text_cache.hit_rate * 100))
+    text_cache.resize(0x4000)
+    text_cache.clear()
+
+
+def bench_callbacks(number=100000):
+    """ per call overhead of the Architecture callbacks, everything but the first call is a cache hit """
+    import binaryninja as bn
+
+    arch = bn.Architecture["v850e2m"]
+    data = bytes.fromhex("21171100") + bytes(4)  # ld.w 16[r1], r2
+    cases = [
+        ("subarch by name", "Subarch[arch.name.upper()]"),
+        ("subarch attribute", "arch.subarch"),
+        ("decode by name", "decode(data, subarch=Subarch[arch.name.upper()])"),
+        ("decode attribute", "arch.decode(data)"),
+        ("get_instruction_info", "arch.get_instruction_info(data, 0)"),
+        ("get_instruction_text", "arch.get_instruction_text(data, 0)"),
+    ]
+    for name, stmt in cases:
+        report("callback           " + name,
+               timed(stmt, number, arch=arch, data=data, Subarch=Subarch, decode=opcode_table.decode_cached), number)
+
+
+def check_decode_range(count=0x40000, seed=0):
+    """ decode_range() sweeps random bytes to the end and agrees with decode() on every instruction """
+    rnd = random.Random(seed)
+    # e0276001 once raised IndexError from ext_subtable23 and ended the sweep
+    data = bytes.fromhex("e0276001") + rnd.getrandbits(count * 8).to_bytes(count, "little")
+    for subarch in (Subarch.V850, Subarch.V850E2M, Subarch.RH850):
+        rng = opcode_table.decode_range(data, subarch=subarch)
+        assert sum(rng.lengths) == len(data), subarch
+        for addr, length, mnem in zip(rng.addrs, rng.lengths, rng.mnems):
+            insn = decode_or_none(data[addr:addr + 8], subarch)
+            if insn is None or insn.mnem == MNEM.INVALID_CODE or addr + insn.length * 2 > len(data):
+                assert (mnem, length) == (MNEM.INVALID_CODE, 2), (subarch, addr)
+            else:
+                assert (mnem, length) == (insn.mnem, insn.length * 2), (subarch, addr)
+    print("%-48s %10s" % ("decode_range over random bytes", "ok"))
+
+
+def check_instruction_lengths(count=0x20000, seed=1):
+    """ instruction_lengths() of random bytes agrees with decode() at every halfword """
+    try:
+        from .lengths import instruction_lengths
+    except ImportError:
+        print("%-48s %10s" % ("instruction_lengths over random bytes", "no numpy"))
+        return
+    rnd = random.Random(seed)
+    data = bytes.fromhex("e0276001") + rnd.getrandbits(count * 8).to_bytes(count, "little")
+    for subarch in (Subarch.V850, Subarch.V850E2M, Subarch.RH850):
+        lengths = instruction_lengths(data, subarch)
+        for off in range(0, len(data), 2):
+            insn = decode_or_none(data[off:off + 8], subarch)
+            expected = 0 if insn is None or insn.mnem == MNEM.INVALID_CODE else insn.length * 2
+            assert lengths[off // 2] == expected, (subarch, off)
+    print("%-48s %10s" % ("instruction_lengths over random bytes", "ok"))
+
+
+def check_cache_keys(seed=2, subarch=Subarch.V850E2M):
+    """ cache_key() spans exactly the bytes of the instruction decode() reports, for every first halfword """
+    rnd = random.Random(seed)
+    for hw in range(0x10000):
+        for low5 in range(0x20 if type(opcode_table.key_sizes[hw]) is tuple else 1):
+            bs = hw.to_bytes(2, "little") + (rnd.getrandbits(48) & ~0x1f | low5).to_bytes(6, "little")
+            insn = decode_or_none(bs, subarch)
+            if insn is not None:
+                assert len(opcode_table.cache_key(bs, subarch)[1]) == insn.length * 2, bs.hex()
+    print("%-48s %10s" % ("cache_key lengths", "ok"))
+
+
+CHECKS = [
+    check_cache_keys,
+    check_decode_range,
+    check_instruction_lengths,
+]
+
+BENCHMARKS = [
+    bench_bitfields,
+    bench_bs2int,
+    bench_operand_allocations,
+    bench_classify,
+    bench_visitors,
+    bench_lift_alu,
+    bench_lift_mem,
+    bench_render,
+    bench_callbacks,
+]
+
+
+def main():
+    for check in CHECKS:
+        check()
+    for bench in BENCHMARKS:
+        bench()
+
+
+if __name__ == "__main__":
+    main()
@@ -24,7 +24,7 @@ sreg_V850E2 = sreg_V850ES + sreg_common + \
 sreg_V850E2M = sreg_V850E2 + [(n, 0x200000 + v) for n, v in sreg_fp] + [("FPEC", 0x20000b)]
 sreg_RH850 = sreg_V850 + sreg_fp + sreg_exc + sreg_common + \
              [("MCFG0", 0x0100), ("RBASE", 0x0102), ("EBASE", 0x0103), ("INTBP", 0x0104),
-              ("MCTL", 0x0105), ("PID", 0x0106), ("SCCFG", 0x010b), ("SCBP", 0x010b)] + \
+              ("MCTL", 0x0105), ("PID", 0x0106), ("SCCFG", 0x010b), ("SCBP", 0x010c)] + \
              [("HTCFG0", 0x0200), ("MEA", 0x0206), ("ASID", 0x0207), ("MEI", 0x0208)]
 
 SREG_V850 = IntEnum("SREG_V850", sreg_V850)
@@ -55,27 +55,29 @@ v850es_mnem = v850e1_mnem + ["DBRET", "DBTRAP"]
 v850e2_mnem = v850es_mnem + ["ADF", "HSH", "MAC", "MACU", "SBF", "SCH0L", "SCH0R", "SCH1L", "SCH1R"]
 v850e2s_mnem = v850e2_mnem + ["CAXI", "DIVQ", "DIVQU", "EIRET", "FERET", "FETRAP", "RIE", "SYNCE", "SYNCM", "SYNCP",
                               "SYSCALL"]
-v850e2m_mnem = v850e2s_mnem + ["ABSF_D", "ABSF_S", "ADDF_D", "ADDF_S",
-                               "CEILF_DL", "CEILF_DUL", "CEILF_DUW", "CEILF_DW",
-                               "CEILF_SL", "CEILF_SUL", "CEILF_SUW", "CEILF_SW",
-                               "CMOVF_D", "CMOVF_S", "CMPF_D", "CMPF_S",
-                               "CVTF_DL", "CVTF_DS", "CVTF_DUL", "CVTF_DUW",
-                               "CVTF_DW", "CVTF_LD", "CVTF_LS", "CVTF_SD",
-                               "CVTF_SL", "CVTF_SUL", "CVTF_SUW", "CVTF_SW",
-                               "CVTF_ULD", "CVTF_ULS", "CVTF_UWD", "CVTF_UWS",
-                               "CVTF_WD", "CVTF_WS", "DIVF_D", "DIVF_S",
-                               "FLOORF_DL", "FLOORF_DUL", "FLOORF_DUW", "FLOORF_DW",
-                               "FLOORF_SL", "FLOORF_SUL", "FLOORF_SUW", "FLOORF_SW",
-                               "MADDF_S",
-                               "MAXF_D", "MAXF_S", "MINF_D", "MINF_S",
-                               "MSUBF_S", "MULF_D", "MULF_S", "NEGF_D", "NEGF_S",
-                               "NMADDF_S", "NMSUBF_S", "RECIPF_D", "RECIPF_S",
-                               "RSQRTF_D", "RSQRTF_S", "SQRTF_D", "SQRTF_S",
-                               "TRFSR",
-                               "TRNCF_DL", "TRNCF_DUL", "TRNCF_DUW", "TRNCF_DW",
-                               "TRNCF_SL", "TRNCF_SUL", "TRNCF_SUW", "TRNCF_SW",
-                               ]
-rh850g3m_mnem = v850e2m_mnem + ["FMAF_S", "FMSF_S", "FNMAF_S", "FNMSF_S", "CVTF_HS", "CVTF_SH"] \
+v850e2m_fp_mnem = ["ABSF_D", "ABSF_S", "ADDF_D", "ADDF_S",
+                   "CEILF_DL", "CEILF_DUL", "CEILF_DUW", "CEILF_DW",
+                   "CEILF_SL", "CEILF_SUL", "CEILF_SUW", "CEILF_SW",
+                   "CMOVF_D", "CMOVF_S", "CMPF_D", "CMPF_S",
+                   "CVTF_DL", "CVTF_DS", "CVTF_DUL", "CVTF_DUW",
+                   "CVTF_DW", "CVTF_LD", "CVTF_LS", "CVTF_SD",
+                   "CVTF_SL", "CVTF_SUL", "CVTF_SUW", "CVTF_SW",
+                   "CVTF_ULD", "CVTF_ULS", "CVTF_UWD", "CVTF_UWS",
+                   "CVTF_WD", "CVTF_WS", "DIVF_D", "DIVF_S",
+                   "FLOORF_DL", "FLOORF_DUL", "FLOORF_DUW", "FLOORF_DW",
+                   "FLOORF_SL", "FLOORF_SUL", "FLOORF_SUW", "FLOORF_SW",
+                   "MADDF_S",
+                   "MAXF_D", "MAXF_S", "MINF_D", "MINF_S",
+                   "MSUBF_S", "MULF_D", "MULF_S", "NEGF_D", "NEGF_S",
+                   "NMADDF_S", "NMSUBF_S", "RECIPF_D", "RECIPF_S",
+                   "RSQRTF_D", "RSQRTF_S", "SQRTF_D", "SQRTF_S",
+                   "SUBF_D", "SUBF_S", "TRFSR",
+                   "TRNCF_DL", "TRNCF_DUL", "TRNCF_DUW", "TRNCF_DW",
+                   "TRNCF_SL", "TRNCF_SUL", "TRNCF_SUW", "TRNCF_SW",
+                   ]
+v850e2m_mnem = v850e2s_mnem + v850e2m_fp_mnem
+rh850_fp_mnem = ["FMAF_S", "FMSF_S", "FNMAF_S", "FNMSF_S", "CVTF_HS", "CVTF_SH"]
+rh850g3m_mnem = v850e2m_mnem + rh850_fp_mnem \
                 + ["BINS", "ROTL", "LOOP", "CLL", "PUSHSP", "POPSP", "SNOOZE", "LDL_W", "STC_W", "SYNCI",
                    "CACHE", "PREF"]
 V850 = IntEnum("V850", [(n, i) for i, n in enumerate(v850_mnem)])
@@ -100,35 +102,49 @@ class Subarch(Enum):
 MNEM = RH850G3M
 
 
+subarch_mnem = {
+    Subarch.V850: v850_mnem,
+    Subarch.V850E: v850e1_mnem,
+    Subarch.V850ES: v850es_mnem,
+    Subarch.V850E2: v850e2_mnem,
+    Subarch.V850E2S: v850e2s_mnem,
+    Subarch.V850E2M: v850e2m_mnem,
+    Subarch.RH850: rh850g3m_mnem,
+}
+
+
+def build_mnem_validity(names):
+    """ a list indexed by MNEM value, True for the mnemonics in names """
+    valid = [False] * (max(MNEM) + 1)
+    for name in names:
+        valid[MNEM[name]] = True
+    valid[MNEM.INVALID_CODE] = valid[MNEM.UNDEF_CODE] = False
+    return valid
+
+
+mnem_validity = {subarch: build_mnem_validity(names) for subarch, names in subarch_mnem.items()}
+
+
+def build_mnem_subarch():
+    """ a list indexed by MNEM value of the first subarch whose mnemonic list introduces it """
+    introduced = [Subarch.Unknown] * (max(MNEM) + 1)
+    for subarch in reversed(subarch_mnem):
+        for mnem, valid in enumerate(mnem_validity[subarch]):
+            if valid:
+                introduced[mnem] = subarch
+    return introduced
+
+
+mnem_subarch = build_mnem_subarch()
+
+
 def guess_subarch(mnem: MNEM):
-    if MNEM.ADD.value <= mnem.value <= MNEM.XORI.value:
-        return Subarch.V850
-    elif MNEM.BSH.value <= mnem.value <= MNEM.ZXH.value:
-        return Subarch.V850E
-    elif mnem in [MNEM.DBRET, MNEM.DBTRAP]:
-        return Subarch.V850ES
-    elif MNEM.ADF.value <= mnem.value <= MNEM.SCH1R.value:
-        return Subarch.V850E2
-    elif MNEM.CAXI.value <= mnem.value <= MNEM.SYSCALL.value:
-        return Subarch.V850E2S
-    elif MNEM.ABSF_D.value <= mnem.value <= MNEM.TRNCF_SW.value:
-        return Subarch.V850E2S
-    elif MNEM.FMAF_S.value <= mnem.value <= MNEM.PREF.value:
-        return Subarch.RH850
-    return Subarch.Unknown
+    return mnem_subarch[mnem]
 
 
 def check_subarch(subarch: Subarch, mnem: MNEM):
     assert subarch != Subarch.Unknown
-    guess = guess_subarch(mnem)
-    if guess == Subarch.Unknown:
-        return False
-    if guess.value <= subarch.value:
-        if Subarch.V850E2.value <= subarch.value:
-            return guess.value != Subarch.V850ES
-        else:
-            return True
-    return False
+    return mnem_validity[subarch][mnem]
 
 
 COND = IntEnum("COND", zip(["V", "L", "Z", "NH", "N", "R", "LT", "LE",
@@ -139,5 +155,11 @@ FCOND = IntEnum("FCOND", zip(["F", "UN", "EQ", "UEQ", "OLT", "ULT", "OLE", "ULE"
                               "SF", "NGLE", "SEQ", "NGL", "LT", "NGE", "LE", "NGT"],
                              range(16)))
 
+# control flow classes of opcode_table.classify(), the raw target is the displacement of the *_REL classes
+# and the absolute address of JUMP
+BRANCH = IntEnum("BRANCH", zip(["NONE", "JUMP", "JUMP_REL", "CALL_REL", "COND_REL", "UNRESOLVED", "RETURN",
+                                "SYSCALL", "EXCEPTION"],
+                               range(9)))
+
 CACHEOP = IntEnum("CACHEOP", ["INVALID", "CHBII", "CIBII", "CFALI", "CISTI", "CILDI", "CLL"])
 PREFOP = IntEnum("PREFOP", ["INVALID", "PREFI"])
@@ -0,0 +1,67 @@
+"""
+Vectorized instruction length classification (requires numpy).
+
+    >>> instruction_lengths(view.read(seg.start, seg.length), Subarch.V850E2M)
+
+returns the length in bytes of the instruction starting at every halfword offset
+(2, 4, 6, 8, or 0 for invalid code), exactly as decode() would report it.
+"""
+import numpy as np
+
+from .enums import MNEM, Subarch
+from . import opcode_table
+from .opcode_table import get_dispatch_table, decode, decode_errors, DecodedInstruction
+
+DEPENDS = 0xff
+
+second_halfword_masks = np.array(opcode_table.second_halfword_masks, dtype=np.uint32)
+
+_first_halfword_lengths = {}
+
+
+def first_halfword_lengths(subarch: Subarch):
+    """ the byte length of each resolved 16-bit entry of the dispatch table, DEPENDS for the others """
+    lengths = _first_halfword_lengths.get(subarch)
+    if lengths is None:
+        lengths = np.full(0x10000, DEPENDS, dtype=np.uint8)
+        for hw, entry in enumerate(get_dispatch_table(subarch)):
+            if type(entry) is DecodedInstruction:
+                lengths[hw] = 0 if entry.mnem == MNEM.INVALID_CODE else entry.length * 2
+        _first_halfword_lengths[subarch] = lengths
+    return lengths
+
+
+def word_length(word: int, subarch: Subarch):
+    """ length in bytes of the instruction starting with word, 0 for invalid code and handler errors """
+    try:
+        insn = decode(word.to_bytes(4, "little"), subarch=subarch)
+    except decode_errors:
+        return 0
+    if insn.mnem == MNEM.INVALID_CODE or insn.mnem == MNEM.UNDEF_CODE:
+        return 0
+    return insn.length * 2
+
+
+def instruction_lengths(data, subarch=Subarch.V850E2M):
+    """ instruction length in bytes at every halfword offset of data (bytes-like or a uint16 array)
+
+    16-bit instructions are classified by a single table lookup. The others are keyed by the
+    first halfword and the bits of the second halfword their decoding depends on, and every
+    distinct key is decoded once. A missing second halfword at the end of data reads as zero.
+    """
+    if isinstance(data, np.ndarray):
+        hw1 = data.astype(np.uint16, copy=False)
+    else:
+        hw1 = np.frombuffer(data, dtype="<u2", count=len(data) // 2)
+    lengths = first_halfword_lengths(subarch)[hw1]
+    pending = np.flatnonzero(lengths == DEPENDS)
+    if len(pending):
+        hw2 = np.zeros(len(pending), dtype=np.uint32)
+        has_next = pending + 1 < len(hw1)
+        hw2[has_next] = hw1[pending[has_next] + 1]
+        first = hw1[pending].astype(np.uint32)
+        keys = first | (hw2 & second_halfword_masks[first]) << 16
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        resolved = np.array([word_length(int(k), subarch) for k in uniq], dtype=np.uint8)
+        lengths[pending] = resolved[inverse]
+    return lengths
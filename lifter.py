@@ -1,10 +1,20 @@
+import re
+
 import binaryninja as bn
 from .enums import MNEM, REG, COND, Subarch, SREG_V850, SREG_V850ES, SREG_V850E2M, SREG_RH850
-from .operand import Operand, RegJump, Reg, RegPair, RegList
+from .enums import v850e2m_fp_mnem, rh850_fp_mnem
+from .operand import Operand, RegJump, Reg, RegPair, RegList, Imm, BasedMem, EpBasedMem
+from .opcode_table import DecodedInstruction
+from .opcode_formats import list12_table
+from .resolvers import resolve_switch, resolve_callt, queue_indirect_branches
+
+
+# LLIL register names indexed by REG value
+reg_names = [REG(i).name.lower() for i in range(max(REG) + 1)]
 
 
 def reg(r, il: bn.LowLevelILFunction):
-    return il.reg(4, r.name.lower())
+    return il.reg(4, reg_names[r])
 
 
 class OperandGet(Operand.Visitor):
@@ -86,6 +96,237 @@ class OperandSet(Operand.Visitor):
         return il
 
 
+def operand_value(op, il: bn.LowLevelILFunction, addr):
+    """ OperandGet for a 32 bit value, without the visitor for registers and immediates """
+    cls = type(op)
+    if cls is Reg:
+        if op.val == REG.R0:
+            return il.const(4, 0)
+        return il.reg(4, reg_names[op.val])
+    if cls is Imm:
+        return il.const(4, op.val)
+    return op.accept(OperandGet(addr), il, size=4)
+
+
+def set_reg_value(r, il: bn.LowLevelILFunction, val):
+    """ OperandSet for a 32 bit register, writes to r0 are only evaluated """
+    if r != REG.R0:
+        val = il.set_reg(4, reg_names[r], val)
+    il.append(val)
+
+
+def set_logic_flags(r, il: bn.LowLevelILFunction, val, cy=None):
+    """ z and s from the 32 bit result in register r (or val when r is r0), ov cleared
+
+    cy, if given, is a function of the result for the carry flag, otherwise cy is left unchanged.
+    """
+    result = val if r == REG.R0 else il.reg(4, reg_names[r])
+    il.append(il.set_flag("z", il.compare_equal(4, result, il.const(4, 0))))
+    il.append(il.set_flag("s", il.compare_signed_less_than(4, result, il.const(4, 0))))
+    il.append(il.set_flag("ov", il.const(0, 0)))
+    if cy is not None:
+        il.append(il.set_flag("cy", cy(result)))
+
+
+def alu_lifter(operation, lhs, rhs, flags, store=True):
+    """ lift method for `dst = operation(operands[lhs], operands[rhs])` writing the flags group
+
+    dst is the last operand, a register. Without store only the flags are written.
+    """
+    op = getattr(bn.LowLevelILFunction, operation)
+
+    if store:
+        def lift(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
+            exp = op(il, 4, operand_value(operands[lhs], il, addr), operand_value(operands[rhs], il, addr),
+                     flags=flags)
+            set_reg_value(operands[-1].val, il, exp)
+    else:
+        def lift(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
+            il.append(op(il, 4, operand_value(operands[lhs], il, addr), operand_value(operands[rhs], il, addr),
+                         flags=flags))
+    return lift
+
+
+def list12_frame(regs):
+    """ (bytes pushed, ((register name, offset from the lowered sp), ...)) for the registers of a list12
+
+    PREPARE pushes the registers in ascending order, the last one ends up at the lowest address.
+    """
+    n = len(regs)
+    return n * 4, tuple((reg_names[r], (n - 1 - i) * 4) for i, r in enumerate(regs))
+
+
+list12_frames = {regs: list12_frame(regs) for regs in list12_table}
+
+
+def sp_offset(il: bn.LowLevelILFunction, offset):
+    if offset:
+        return il.add(4, il.reg(4, "sp"), il.const(4, offset))
+    return il.reg(4, "sp")
+
+
+# FP operand types by mnemonic suffix: (size, is float)
+fp_types = {
+    "H": (2, True),
+    "S": (4, True),
+    "D": (8, True),
+    "W": (4, False),
+    "UW": (4, False),
+    "L": (8, False),
+    "UL": (8, False),
+}
+
+# register pair names (hi, lo) of the 8 byte FP operands, indexed by either register of the pair
+pair_names = [(reg_names[r | 1], reg_names[r & ~1]) for r in range(32)]
+
+
+def build_fp_params(names):
+    """ lift_params of the FP mnemonics: (source type, destination type) by name and suffix
+
+    CVTF_ULS converts an UL to an S, ADDF_D reads and writes Ds.
+    """
+    params = {}
+    for mnem in names:
+        name, _, suffix = mnem.partition("_")
+        if suffix:
+            types = re.findall("U?[SDHWL]", suffix)
+            params.setdefault(name, {})[suffix] = (types[0], types[-1])
+    return params
+
+
+fp_params = build_fp_params(v850e2m_fp_mnem + rh850_fp_mnem)
+
+# conversions without an LLIL equivalent, lifted to intrinsics named after the mnemonic
+fp_intrinsics = {
+    ("%s_%s" % (name, suffix)).lower(): types
+    for name, suffixes in fp_params.items() for suffix, types in suffixes.items() if "UL" in types
+}
+
+
+def fp_get(op, t, il: bn.LowLevelILFunction):
+    """ the value of the FP operand op of type t, 8 byte types are read from a register pair """
+    size = fp_types[t][0]
+    if size == 8:
+        hi, lo = pair_names[int(op.reg_lo) if type(op) is RegPair else int(op)]
+        return il.reg_split(8, hi, lo)
+    if op.val == REG.R0:
+        return il.const(size, 0)
+    val = il.reg(4, reg_names[op.val])
+    if size == 2:
+        val = il.low_part(2, val)
+    return val
+
+
+def fp_set(op, t, il: bn.LowLevelILFunction, val):
+    """ write val of type t to the FP operand op, halfwords are zero extended """
+    size = fp_types[t][0]
+    if size == 8:
+        hi, lo = pair_names[int(op.reg_lo) if type(op) is RegPair else int(op)]
+        if lo != "r0":
+            val = il.set_reg_split(8, hi, lo, val)
+        il.append(val)
+        return
+    if size == 2:
+        val = il.zero_extend(4, val)
+    set_reg_value(op.val, il, val)
+
+
+def fp_const(il: bn.LowLevelILFunction, t, value):
+    if fp_types[t][0] == 8:
+        return il.float_const_double(value)
+    return il.float_const_single(value)
+
+
+def fp_cc(il: bn.LowLevelILFunction, fcbit):
+    """ condition bit CC<fcbit> of FPSR is set """
+    mask = il.const(4, 1 << (24 + fcbit))
+    return il.compare_not_equal(4, il.and_expr(4, il.reg(4, "fpsr"), mask), il.const(4, 0))
+
+
+def fp_binop_lifter(operation):
+    """ lift method for `reg3 = operation(reg2, reg1)` """
+    op = getattr(bn.LowLevelILFunction, operation)
+
+    def lift(self, mnem, operands, length, addr, il: bn.LowLevelILFunction, src, dst):
+        reg1, reg2, reg3 = operands
+        fp_set(reg3, dst, il, op(il, fp_types[src][0], fp_get(reg2, src, il), fp_get(reg1, src, il)))
+    return lift
+
+
+def fp_unop_lifter(operation):
+    """ lift method for `reg3 = operation(reg2)` """
+    op = getattr(bn.LowLevelILFunction, operation)
+
+    def lift(self, mnem, operands, length, addr, il: bn.LowLevelILFunction, src, dst):
+        reg2, reg3 = operands
+        fp_set(reg3, dst, il, op(il, fp_types[src][0], fp_get(reg2, src, il)))
+    return lift
+
+
+def fp_select_lifter(comparison):
+    """ lift method for `reg3 = reg2 if comparison(reg2, reg1) else reg1` """
+    op = getattr(bn.LowLevelILFunction, comparison)
+
+    def lift(self, mnem, operands, length, addr, il: bn.LowLevelILFunction, src, dst):
+        reg1, reg2, reg3 = operands
+        size = fp_types[src][0]
+        il_if_then_else(il, op(il, size, fp_get(reg2, src, il), fp_get(reg1, src, il)),
+                        lambda il: fp_set(reg3, dst, il, fp_get(reg2, src, il)),
+                        lambda il: fp_set(reg3, dst, il, fp_get(reg1, src, il)))
+    return lift
+
+
+def fp_convert_lifter(rounding):
+    """ lift method for the conversion `reg3 = reg2`, float to integer conversions round with `rounding` first """
+    rnd = getattr(bn.LowLevelILFunction, rounding)
+
+    def lift(self, mnem, operands, length, addr, il: bn.LowLevelILFunction, src, dst):
+        reg2, reg3 = operands
+        (ssize, sfloat), (dsize, dfloat) = fp_types[src], fp_types[dst]
+        if "UL" in (src, dst):
+            # LLIL conversions are signed, an UW fits into a 64 bit signed integer but an UL does not
+            if dsize == 8:
+                outputs = list(pair_names[int(reg3.reg_lo) if type(reg3) is RegPair else int(reg3)])
+            else:
+                outputs = [reg_names[reg3.val]]
+            # like fp_set, a destination in r0 (or the r0 pair) only evaluates the conversion
+            if outputs[-1] == reg_names[REG.R0]:
+                outputs = []
+            il.append(il.intrinsic(outputs, mnem.name.lower(), [fp_get(reg2, src, il)]))
+            return
+        val = fp_get(reg2, src, il)
+        if sfloat and dfloat:
+            val = il.float_convert(dsize, val)
+        elif sfloat:
+            val = rnd(il, ssize, val)
+            if dst == "UW":
+                val = il.low_part(4, il.float_to_int(8, val))
+            else:
+                val = il.float_to_int(dsize, val)
+        else:
+            if src == "UW":
+                val = il.zero_extend(8, val)
+            val = il.int_to_float(dsize, val)
+        fp_set(reg3, dst, il, val)
+    return lift
+
+
+def fp_fma_lifter(subtract, negate):
+    """ lift method for `dst = [-](reg2 * reg1 +/- reg3)`, dst being the last operand """
+    def lift(self, mnem, operands, length, addr, il: bn.LowLevelILFunction, src, dst):
+        reg1, reg2, reg3 = operands[:3]
+        size = fp_types[src][0]
+        val = il.float_mult(size, fp_get(reg2, src, il), fp_get(reg1, src, il))
+        if subtract:
+            val = il.float_sub(size, val, fp_get(reg3, src, il))
+        else:
+            val = il.float_add(size, val, fp_get(reg3, src, il))
+        if negate:
+            val = il.float_neg(size, val)
+        fp_set(operands[-1], dst, il, val)
+    return lift
+
+
 class SysRegLifterBase(object):
     def get_sysreg(self, rID, bsel=None):
         pass
@@ -97,11 +338,96 @@ class SysRegLifterBase(object):
         pass
 
 
+load_params = {"B": (1, True), "BU": (1, False), "H": (2, True), "HU": (2, False), "W": (4, True)}
+store_params = {"B": (1, False), "H": (2, False), "W": (4, False)}
+
+# addressing of the memory operand by load/store name, SLD/SST are ep relative
+mem_kinds = {"LD": BasedMem, "SLD": EpBasedMem, "ST": BasedMem, "SST": EpBasedMem}
+
+
+def build_mem_params():
+    """ lift_params of the loads and stores: (size, signed, addressing kind) by name and suffix """
+    params = {}
+    for name, kind in mem_kinds.items():
+        sizes = load_params if name.endswith("LD") else store_params
+        params[name] = {suffix: size_signed + (kind,) for suffix, size_signed in sizes.items()}
+    return params
+
+
+mem_params = build_mem_params()
+
+
+def build_mem_access():
+    """ (size, signed, addressing kind) of the loads and stores by MNEM """
+    table = {}
+    for mnem in MNEM:
+        name, _, suffix = mnem.name.partition("_")
+        if suffix in mem_params.get(name, ()):
+            table[mnem] = mem_params[name][suffix]
+    return table
+
+
+mem_access = build_mem_access()
+
+# loads and stores with a disp16/disp23 based address, the second half of a fused MOVHI
+fused_loads = {mnem for mnem in mem_access if mnem.name.startswith("LD_")}
+fused_stores = {mnem for mnem in mem_access if mnem.name.startswith("ST_")}
+
+
+def mem_address(op, il: bn.LowLevelILFunction):
+    """ the address of a BasedMem/EpBasedMem operand, r0 based addresses are constant pointers """
+    disp = int(op.disp)
+    if op.base == REG.R0:
+        return il.const_pointer(4, disp & 0xffffffff)
+    base = il.reg(4, reg_names[op.base])
+    if disp:
+        return il.add(4, base, il.const(4, disp))
+    return base
+
+
 class LifterBase(object):
+    # extra arguments of the lift methods, by method name and mnemonic suffix
+    lift_params = dict(mem_params)
+    lift_table = []
+    fuse_table = {}
+
+    # lift recognised instruction pairs as one, see the fuse_* methods;
+    # enable it per architecture with bn.Architecture["v850e2m"].lifter.fusion = True
+    fusion = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.lift_table = cls.build_lift_table()
+        cls.fuse_table = cls.build_fuse_table()
+
+    @classmethod
+    def build_lift_table(cls):
+        """ (lift method, static arguments) indexed by MNEM value """
+        table = [(cls.lift_Default, ())] * (max(MNEM) + 1)
+        for mnem in MNEM:
+            name, _, suffix = mnem.name.partition("_")
+            meth = getattr(cls, "lift_" + name, cls.lift_Default)
+            params = cls.lift_params[name][suffix] if name in cls.lift_params else ()
+            table[mnem] = (meth, params)
+        return table
+
+    @classmethod
+    def build_fuse_table(cls):
+        """ MNEM -> fuse method for the first instruction of a pair """
+        table = {}
+        for mnem in MNEM:
+            meth = getattr(cls, "fuse_" + mnem.name, None)
+            if meth is not None:
+                table[mnem] = meth
+        return table
+
     def __init__(self, arch=None):
         if arch is None:
             arch = bn.Architecture["v850"]
         self.arch = arch
+        self.subarch = Subarch[arch.name.upper()]
+        self.lift_handlers = [(meth.__get__(self), params) for meth, params in self.lift_table]
+        self.fuse_handlers = {mnem: meth.__get__(self) for mnem, meth in self.fuse_table.items()}
 
     def ldsr(self, val, sreg, il):
         pass
@@ -109,10 +435,16 @@ class LifterBase(object):
     def stsr(self, sreg, reg, il):
         pass
 
-    def process_instruction(self, mnem: MNEM, operands, length: int, addr: int, il: bn.LowLevelILFunction):
-        name = mnem.name.split("_")[0]
-        meth = getattr(self, "lift_" + name, self.lift_Default)
-        return meth(mnem, operands, length, addr, il)
+    def process_instruction(self, insn: DecodedInstruction, addr: int, il: bn.LowLevelILFunction):
+        meth, params = self.lift_handlers[insn.mnem]
+        return meth(insn.mnem, insn.operands, insn.length, addr, il, *params)
+
+    def process_pair(self, insn: DecodedInstruction, nxt: DecodedInstruction, addr: int, il: bn.LowLevelILFunction):
+        """ lift insn and the following nxt together, returns the bytes consumed or 0 if they do not fuse """
+        fuse = self.fuse_handlers.get(insn.mnem)
+        if fuse is None:
+            return 0
+        return fuse(insn, nxt, addr, il)
 
     def lift_Default(self, mnem: MNEM, operands, length: int, addr: int, il: bn.LowLevelILFunction):
         il.append(il.unimplemented())
@@ -165,41 +497,19 @@ class V850Lifter(LifterBase):
             ex = il.set_reg(4, reg, il.reg(4, sr.name.lower()))
             il.append(ex)
 
-    def lift_ADD(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
-        src, dst = operands
-        getter = OperandGet(addr)
-        val0 = src.accept(getter, il, size=4)
-        val1 = dst.accept(getter, il, size=4)
-        exp = il.add(4, val0, val1, flags="nosat")
-        setter = OperandSet(addr)
-        dst.accept(setter, il, exp, size=4)
-
-    def lift_ADDI(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
-        src0, src1, dst = operands
-        getter = OperandGet(addr)
-        val0 = src0.accept(getter, il, size=4)
-        val1 = src1.accept(getter, il, size=4)
-        exp = il.add(4, val0, val1, flags="nosat")
-        setter = OperandSet(addr)
-        dst.accept(setter, il, exp, size=4)
-
-    def lift_AND(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
-        src, dst = operands
-        getter = OperandGet(addr)
-        val0 = src.accept(getter, il, size=4)
-        val1 = dst.accept(getter, il, size=4)
-        exp = il.and_expr(4, val0, val1, flags="zsov")
-        setter = OperandSet(addr)
-        dst.accept(setter, il, exp, size=4)
-
-    def lift_ANDI(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
-        src0, src1, dst = operands
-        getter = OperandGet(addr)
-        val0 = src0.accept(getter, il, size=4)
-        val1 = src1.accept(getter, il, size=4)
-        exp = il.and_expr(4, val0, val1, flags="zsov")
-        setter = OperandSet(addr)
-        dst.accept(setter, il, exp, size=4)
+    # ALU instructions: il operation, index of the lhs and rhs operands, flags written, result stored
+    lift_ADD = alu_lifter("add", 0, 1, "nosat")
+    lift_ADDI = alu_lifter("add", 0, 1, "nosat")
+    lift_SUB = alu_lifter("sub", 1, 0, "nosat")
+    lift_SUBR = alu_lifter("sub", 0, 1, "nosat")
+    lift_CMP = alu_lifter("sub", 1, 0, "nosat", store=False)
+    lift_AND = alu_lifter("and_expr", 0, 1, "zsov")
+    lift_ANDI = alu_lifter("and_expr", 0, 1, "zsov")
+    lift_OR = alu_lifter("or_expr", 0, 1, "zsov")
+    lift_ORI = alu_lifter("or_expr", 0, 1, "zsov")
+    lift_XOR = alu_lifter("xor_expr", 0, 1, "zsov")
+    lift_XORI = alu_lifter("xor_expr", 0, 1, "zsov")
+    lift_TST = alu_lifter("and_expr", 0, 1, "zsov", store=False)
 
     cond_il = {
         COND.V: lambda il: il.flag_condition(bn.LowLevelILFlagCondition.LLFC_O),
@@ -218,35 +528,87 @@ class V850Lifter(LifterBase):
         COND.GE: lambda il: il.flag_condition(bn.LowLevelILFlagCondition.LLFC_SGE),
         COND.GT: lambda il: il.flag_condition(bn.LowLevelILFlagCondition.LLFC_SGT),
     }
+    # direct conditions on the operands of CMP src, dst (flags of dst - src) and TST src, dst (flags of dst & src)
+    cmp_cond_il = {
+        COND.L: lambda il, a, b: il.compare_unsigned_less_than(4, a, b),
+        COND.Z: lambda il, a, b: il.compare_equal(4, a, b),
+        COND.NH: lambda il, a, b: il.compare_unsigned_less_equal(4, a, b),
+        COND.N: lambda il, a, b: il.compare_signed_less_than(4, il.sub(4, a, b), il.const(4, 0)),
+        COND.LT: lambda il, a, b: il.compare_signed_less_than(4, a, b),
+        COND.LE: lambda il, a, b: il.compare_signed_less_equal(4, a, b),
+        COND.NL: lambda il, a, b: il.compare_unsigned_greater_equal(4, a, b),
+        COND.NZ: lambda il, a, b: il.compare_not_equal(4, a, b),
+        COND.H: lambda il, a, b: il.compare_unsigned_greater_than(4, a, b),
+        COND.P: lambda il, a, b: il.compare_signed_greater_equal(4, il.sub(4, a, b), il.const(4, 0)),
+        COND.GE: lambda il, a, b: il.compare_signed_greater_equal(4, a, b),
+        COND.GT: lambda il, a, b: il.compare_signed_greater_than(4, a, b),
+    }
+    tst_cond_il = {
+        COND.Z: lambda il, a, b: il.compare_equal(4, il.and_expr(4, a, b), il.const(4, 0)),
+        COND.N: lambda il, a, b: il.compare_signed_less_than(4, il.and_expr(4, a, b), il.const(4, 0)),
+        COND.LT: lambda il, a, b: il.compare_signed_less_than(4, il.and_expr(4, a, b), il.const(4, 0)),
+        COND.LE: lambda il, a, b: il.compare_signed_less_equal(4, il.and_expr(4, a, b), il.const(4, 0)),
+        COND.NZ: lambda il, a, b: il.compare_not_equal(4, il.and_expr(4, a, b), il.const(4, 0)),
+        COND.P: lambda il, a, b: il.compare_signed_greater_equal(4, il.and_expr(4, a, b), il.const(4, 0)),
+        COND.GE: lambda il, a, b: il.compare_signed_greater_equal(4, il.and_expr(4, a, b), il.const(4, 0)),
+        COND.GT: lambda il, a, b: il.compare_signed_greater_than(4, il.and_expr(4, a, b), il.const(4, 0)),
+    }
+
+    def fuse_compare_branch(self, conds, insn, nxt, addr, il: bn.LowLevelILFunction):
+        """ CMP/TST followed by Bcc: the flags are still written, the branch tests the operands directly """
+        if nxt.mnem != MNEM.B:
+            return 0
+        cond, disp = nxt.operands
+        make = conds.get(cond.val)
+        if make is None:
+            return 0
+        src, dst = insn.operands
+        meth, params = self.lift_handlers[insn.mnem]
+        meth(insn.mnem, insn.operands, insn.length, addr, il, *params)
+        c = make(il, operand_value(dst, il, addr), operand_value(src, il, addr))
+        baddr = addr + insn.length * 2
+        self.branch(c, baddr + int(disp), baddr + nxt.length * 2, il)
+        return baddr - addr + nxt.length * 2
+
+    def fuse_CMP(self, insn, nxt, addr, il: bn.LowLevelILFunction):
+        return self.fuse_compare_branch(self.cmp_cond_il, insn, nxt, addr, il)
+
+    def fuse_TST(self, insn, nxt, addr, il: bn.LowLevelILFunction):
+        return self.fuse_compare_branch(self.tst_cond_il, insn, nxt, addr, il)
+
     def lift_B(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
         cond, disp = operands
         dest = addr + int(disp)
-        tgt = il.get_label_for_address(self.arch, dest)
-        flt = il.get_label_for_address(self.arch, addr + length * 2)
         if cond.val == COND.R:
+            tgt = il.get_label_for_address(self.arch, dest)
             if tgt:
                 ex = il.goto(tgt)
             else:
                 ex = il.jump(il.const_pointer(4, dest))
             il.append(ex)
         else:
-            c = self.cond_il[cond.val](il)
-            if tgt:
-                t = tgt
-            else:
-                t = bn.LowLevelILLabel()
-            if flt:
-                f = flt
-            else:
-                f = bn.LowLevelILLabel()
-            ex = il.if_expr(c, t, f)
+            self.branch(self.cond_il[cond.val](il), dest, addr + length * 2, il)
+
+    def branch(self, c, dest, fallthrough, il: bn.LowLevelILFunction):
+        """ conditional branch to dest on c """
+        tgt = il.get_label_for_address(self.arch, dest)
+        flt = il.get_label_for_address(self.arch, fallthrough)
+        if tgt:
+            t = tgt
+        else:
+            t = bn.LowLevelILLabel()
+        if flt:
+            f = flt
+        else:
+            f = bn.LowLevelILLabel()
+        ex = il.if_expr(c, t, f)
+        il.append(ex)
+        if not tgt:
+            il.mark_label(t)
+            ex = il.jump(il.const_pointer(4, dest))
             il.append(ex)
-            if not tgt:
-                il.mark_label(t)
-                ex = il.jump(il.const_pointer(4, dest))
-                il.append(ex)
-            if not flt:
-                il.mark_label(f)
+        if not flt:
+            il.mark_label(f)
 
     def bit1op(self, mnem, operands, length, addr, il: bn.LowLevelILFunction, binop):
         getter = OperandGet(addr)
@@ -272,23 +634,17 @@ class V850Lifter(LifterBase):
 
         return self.bit1op(mnem, operands, length, addr, il, clr1)
 
-    def lift_CMP(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
-        src, dst = operands
-        getter = OperandGet(addr)
-        val0 = src.accept(getter, il, size=4)
-        val1 = dst.accept(getter, il, size=4)
-        exp = il.sub(4, val1, val0, flags="nosat")
-        il.append(exp)
-
     def lift_DISPOSE(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
         imm, list12 = operands[:2]
-        # list12 : RegList
         ret = None
         if len(operands) == 3:
             ret = operands[2]
-        il.append(il.set_reg(4, "sp", il.add(4, il.reg(4, "sp"), il.const(4, int(imm)))))
-        for r in reversed(list12.reg_list):
-            il.append(il.set_reg(4, r.name.lower(), il.pop(4)))
+        pushed, slots = list12_frames[list12.reg_list]
+        local = int(imm) << 2
+        for name, offset in slots:
+            il.append(il.set_reg(4, name, il.load(4, sp_offset(il, local + offset))))
+        if pushed + local:
+            il.append(il.set_reg(4, "sp", sp_offset(il, pushed + local)))
 
         if ret:
             r = reg(ret.val, il)
@@ -327,25 +683,18 @@ class V850Lifter(LifterBase):
         ex = il.jump(dest)
         il.append(ex)
 
-    def lift_LD(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
-        post = mnem.name.split("_")[1]
-        size, signed = {
-            "B": (1, True),
-            "BU": (1, False),
-            "H": (2, True),
-            "HU": (2, False),
-            "W": (4, True),
-        }[post]
+    def lift_LD(self, mnem, operands, length, addr, il: bn.LowLevelILFunction, size=4, signed=True, kind=BasedMem):
         src, dst = operands
-        getter = OperandGet(addr)
-        val = src.accept(getter, il, size=size)
+        if type(src) is kind:
+            val = il.load(size, mem_address(src, il))
+        else:
+            val = src.accept(OperandGet(addr), il, size=size)
         if size < 4:
             if signed:
                 val = il.sign_extend(4, val)
             else:
                 val = il.zero_extend(4, val)
-        setter = OperandSet(addr)
-        dst.accept(setter, il, val, 4)
+        set_reg_value(dst.val, il, val)
 
     def lift_LDSR(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
         reg, sreg = operands
@@ -373,6 +722,40 @@ class V850Lifter(LifterBase):
         setter = OperandSet(addr)
         dst.accept(setter, il, il.add(4, val, il.const(4, int(imm) << 16)), size=4)
 
+    def fuse_MOVHI(self, insn, nxt, addr, il: bn.LowLevelILFunction):
+        """ MOVHI hi, r0, rX followed by MOVEA lo, rX, rY or by a load/store at lo[rX]: the address is a const_pointer """
+        hi, src, tmp = insn.operands
+        if src.val != REG.R0 or tmp.val == REG.R0:
+            return 0
+        upper = (int(hi) << 16) & 0xffffffff
+        if nxt.mnem == MNEM.MOVEA:
+            lo, base, dst = nxt.operands
+            if base.val != tmp.val:
+                return 0
+            set_reg_value(tmp.val, il, il.const(4, upper))
+            set_reg_value(dst.val, il, il.const_pointer(4, (upper + int(lo)) & 0xffffffff))
+        elif nxt.mnem in fused_loads:
+            mem, dst = nxt.operands
+            if not isinstance(mem, BasedMem) or mem.base != tmp.val:
+                return 0
+            size, signed, _ = mem_access[nxt.mnem]
+            set_reg_value(tmp.val, il, il.const(4, upper))
+            val = il.load(size, il.const_pointer(4, (upper + int(mem.disp)) & 0xffffffff))
+            if size < 4:
+                val = il.sign_extend(4, val) if signed else il.zero_extend(4, val)
+            set_reg_value(dst.val, il, val)
+        elif nxt.mnem in fused_stores:
+            val, mem = nxt.operands
+            if not isinstance(mem, BasedMem) or mem.base != tmp.val:
+                return 0
+            size, _, _ = mem_access[nxt.mnem]
+            set_reg_value(tmp.val, il, il.const(4, upper))
+            val = val.accept(OperandGet(addr), il, size=size)
+            il.append(il.store(size, il.const_pointer(4, (upper + int(mem.disp)) & 0xffffffff), val))
+        else:
+            return 0
+        return (insn.length + nxt.length) * 2
+
     def lift_MUL(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
         src0, src1, dst = operands
         assert isinstance(src1, Reg) and isinstance(dst, Reg)
@@ -420,36 +803,16 @@ class V850Lifter(LifterBase):
 
         return self.bit1op(mnem, operands, length, addr, il, not1)
 
-    def lift_OR(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
-        src, dst = operands
-        getter = OperandGet(addr)
-        val0 = src.accept(getter, il, size=4)
-        val1 = dst.accept(getter, il, size=4)
-        exp = il.or_expr(4, val0, val1, flags="zsov")
-        setter = OperandSet(addr)
-        dst.accept(setter, il, exp, size=4)
-
-    def lift_ORI(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
-        src0, src1, dst = operands
-        getter = OperandGet(addr)
-        val0 = src0.accept(getter, il, size=4)
-        val1 = src1.accept(getter, il, size=4)
-        exp = il.or_expr(4, val0, val1, flags="zsov")
-        setter = OperandSet(addr)
-        dst.accept(setter, il, exp, size=4)
-
     def lift_PREPARE(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
         list12, imm = operands[:2]
-        ep = None
+        pushed, slots = list12_frames[list12.reg_list]
+        local = int(imm) << 2
+        if pushed + local:
+            il.append(il.set_reg(4, "sp", il.sub(4, il.reg(4, "sp"), il.const(4, pushed + local))))
+        for name, offset in slots:
+            il.append(il.store(4, sp_offset(il, local + offset), il.reg(4, name)))
         if len(operands) == 3:
-            ep = operands[2]
-        for r in list12:
-            il.append(il.push(4, reg(r, il)))
-        il.append(il.set_reg(4, "sp", il.sub(4, il.reg(4, "sp"), il.const(4, int(imm)))))
-        if ep:
-            getter = OperandGet(addr)
-            val = ep.accept(getter, il, size=4)
-            il.append(il.set_reg(4, "ep", val))
+            il.append(il.set_reg(4, "ep", operand_value(operands[2], il, addr)))
 
     def lift_SAR(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
         sft, src = operands[:2]
@@ -517,55 +880,45 @@ class V850Lifter(LifterBase):
 
     lift_SLD = lift_LD
 
-    def lift_ST(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
-        post = mnem.name.split("_")[1]
-        size, signed = {
-            "B": (1, True),
-            "BU": (1, False),
-            "H": (2, True),
-            "HU": (2, False),
-            "W": (4, True),
-        }[post]
+    def lift_ST(self, mnem, operands, length, addr, il: bn.LowLevelILFunction, size=4, signed=False, kind=BasedMem):
         src, dst = operands
-        getter = OperandGet(addr)
-        val = src.accept(getter, il, size=size)
-        setter = OperandSet(addr)
-        dst.accept(setter, il, val, size)
+        if src.val == REG.R0:
+            val = il.const(size, 0)
+        else:
+            val = il.reg(4, reg_names[src.val])
+            if size < 4:
+                val = il.low_part(size, val)
+        if type(dst) is kind:
+            il.append(il.store(size, mem_address(dst, il), val))
+        else:
+            dst.accept(OperandSet(addr), il, val, size)
 
     lift_SST = lift_ST
 
-    def lift_SUB(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
-        src, dst = operands
-        getter = OperandGet(addr)
-        val0 = src.accept(getter, il, size=4)
-        val1 = dst.accept(getter, il, size=4)
-        exp = il.sub(4, val1, val0, flags="nosat")
-        setter = OperandSet(addr)
-        dst.accept(setter, il, exp, size=4)
-
     def lift_STSR(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
         sreg, reg = operands
         reg = reg.val.name.lower()
         self.stsr(int(sreg), reg, il)
 
-    def lift_SUBR(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
-        src, dst = operands
-        getter = OperandGet(addr)
-        val0 = src.accept(getter, il, size=4)
-        val1 = dst.accept(getter, il, size=4)
-        exp = il.sub(4, val0, val1, flags="nosat")
-        setter = OperandSet(addr)
-        dst.accept(setter, il, exp, size=4)
-
     def lift_SWITCH(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
         r = operands[0]
         assert isinstance(r, Reg)
+        targets = ()
+        func = il.source_function
+        if func is not None:
+            targets = resolve_switch(func.view, addr, r.val, self.subarch)
+            if targets:
+                queue_indirect_branches(func, self.arch, addr, targets)
         r = reg(r.val, il)
         npc = il.const(4, addr + length * 2)
         adr = il.add(4, npc, il.shift_left(4, r, il.const(4, 1)))
         tbl = il.shift_left(4, il.sign_extend(4, il.load(2, adr)), il.const(4, 1))
         dest = il.add(4, npc, tbl)
-        il.append(il.jump(dest))
+        labels = {target: il.get_label_for_address(self.arch, target) for target in targets}
+        if targets and all(labels.values()):
+            il.append(il.jump_to(dest, labels))
+        else:
+            il.append(il.jump(dest))
 
     def lift_SXB(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
         dst = operands[0]
@@ -585,35 +938,9 @@ class V850Lifter(LifterBase):
         vec = operands[0]
         il.append(il.trap(int(vec)))
 
-    def lift_TST(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
-        src, dst = operands
-        getter = OperandGet(addr)
-        val0 = src.accept(getter, il, size=4)
-        val1 = dst.accept(getter, il, size=4)
-        exp = il.and_expr(4, val0, val1, flags="zsov")
-        il.append(exp)
-
     def lift_TST1(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
         return self.bit1op(mnem, operands, length, addr, il, None)
 
-    def lift_XOR(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
-        src, dst = operands
-        getter = OperandGet(addr)
-        val0 = src.accept(getter, il, size=4)
-        val1 = dst.accept(getter, il, size=4)
-        exp = il.xor_expr(4, val0, val1, flags="zsov")
-        setter = OperandSet(addr)
-        dst.accept(setter, il, exp, size=4)
-
-    def lift_XORI(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
-        src0, src1, dst = operands
-        getter = OperandGet(addr)
-        val0 = src0.accept(getter, il, size=4)
-        val1 = src1.accept(getter, il, size=4)
-        exp = il.xor_expr(4, val0, val1, flags="zsov")
-        setter = OperandSet(addr)
-        dst.accept(setter, il, exp, size=4)
-
     def lift_ZXB(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
         dst = operands[0]
         getter = OperandGet(addr)
@@ -662,10 +989,15 @@ class V850ESLifter(V850Lifter):
         # ctpsw <- PSW
         e = il.set_reg(4, "ctpsw", il.reg(4, "psw"))
         il.append(e)
+        func = il.source_function
+        target = resolve_callt(func.view, int(imm), self.subarch) if func is not None else None
+        if target is not None:
+            il.append(il.call(il.const_pointer(4, target)))
+            return
         # adr <- ctbp + imm << 1
         adr = il.add(4, il.reg(4, "ctbp"), il.const(4, int(imm) << 1))
         ld = il.load(2, adr)
-        e = il.jump(il.add(4, il.reg(4, "ctbp"), il.zero_extend(4, ld)))
+        e = il.call(il.add(4, il.reg(4, "ctbp"), il.zero_extend(4, ld)))
         il.append(e)
 
     def lift_CMOV(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
@@ -692,6 +1024,69 @@ class V850ESLifter(V850Lifter):
 
 class V850E2Lifter(V850ESLifter):
     sysreg = SREG_V850E2M
+    lift_params = dict(LifterBase.lift_params, **fp_params)
+
+    # FPU: reg3 = reg2 op reg1, reg3 = op(reg2), conversions reg3 = reg2 and the multiply-adds
+    lift_ADDF = fp_binop_lifter("float_add")
+    lift_SUBF = fp_binop_lifter("float_sub")
+    lift_MULF = fp_binop_lifter("float_mult")
+    lift_DIVF = fp_binop_lifter("float_div")
+    lift_MAXF = fp_select_lifter("float_compare_greater_equal")
+    lift_MINF = fp_select_lifter("float_compare_less_equal")
+    lift_ABSF = fp_unop_lifter("float_abs")
+    lift_NEGF = fp_unop_lifter("float_neg")
+    lift_SQRTF = fp_unop_lifter("float_sqrt")
+    lift_CVTF = fp_convert_lifter("round_to_int")
+    lift_TRNCF = fp_convert_lifter("float_trunc")
+    lift_CEILF = fp_convert_lifter("ceil")
+    lift_FLOORF = fp_convert_lifter("floor")
+    lift_MADDF = lift_FMAF = fp_fma_lifter(subtract=False, negate=False)
+    lift_MSUBF = lift_FMSF = fp_fma_lifter(subtract=True, negate=False)
+    lift_NMADDF = lift_FNMAF = fp_fma_lifter(subtract=False, negate=True)
+    lift_NMSUBF = lift_FNMSF = fp_fma_lifter(subtract=True, negate=True)
+
+    def lift_RECIPF(self, mnem, operands, length, addr, il: bn.LowLevelILFunction, src, dst):
+        reg2, reg3 = operands
+        size = fp_types[src][0]
+        fp_set(reg3, dst, il, il.float_div(size, fp_const(il, src, 1.0), fp_get(reg2, src, il)))
+
+    def lift_RSQRTF(self, mnem, operands, length, addr, il: bn.LowLevelILFunction, src, dst):
+        reg2, reg3 = operands
+        size = fp_types[src][0]
+        val = il.float_sqrt(size, fp_get(reg2, src, il))
+        fp_set(reg3, dst, il, il.float_div(size, fp_const(il, src, 1.0), val))
+
+    # CMPF fcond bits: 0 unordered, 1 equal, 2 less than; bit 3 only selects the signaling compares
+    fcond_compares = [
+        (1, "float_compare_unordered"),
+        (2, "float_compare_equal"),
+        (4, "float_compare_less_than"),
+    ]
+
+    def lift_CMPF(self, mnem, operands, length, addr, il: bn.LowLevelILFunction, src, dst):
+        fcond, reg2, reg1 = operands[:3]
+        fcbit = int(operands[3]) if len(operands) == 4 else 0
+        size = fp_types[src][0]
+        val = None
+        for bit, comparison in self.fcond_compares:
+            if int(fcond) & bit:
+                cmp = il.bool_to_int(4, getattr(il, comparison)(size, fp_get(reg2, src, il), fp_get(reg1, src, il)))
+                val = cmp if val is None else il.or_expr(4, val, cmp)
+        mask = 1 << (24 + fcbit)
+        fpsr = il.and_expr(4, il.reg(4, "fpsr"), il.const(4, ~mask & 0xffffffff))
+        if val is not None:
+            fpsr = il.or_expr(4, fpsr, il.shift_left(4, val, il.const(1, 24 + fcbit)))
+        il.append(il.set_reg(4, "fpsr", fpsr))
+
+    def lift_CMOVF(self, mnem, operands, length, addr, il: bn.LowLevelILFunction, src, dst):
+        fcbit, reg1, reg2, reg3 = operands
+        il_if_then_else(il, fp_cc(il, int(fcbit)),
+                        lambda il: fp_set(reg3, dst, il, fp_get(reg1, src, il)),
+                        lambda il: fp_set(reg3, dst, il, fp_get(reg2, src, il)))
+
+    def lift_TRFSR(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
+        fcbit, = operands
+        il.append(il.set_flag("z", fp_cc(il, int(fcbit))))
 
     def ldsr(self, val, rid, il: bn.LowLevelILFunction):
         if 28 <= rid < 32:
@@ -755,7 +1150,79 @@ class V850E2Lifter(V850ESLifter):
 
 
 class RH850Lifter(V850E2Lifter):
-    sysreg = SREG_V850
+    sysreg = SREG_RH850
+
+    def lift_BINS(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
+        src, wid, pos, dst = operands
+        mask = ((1 << int(wid)) - 1) << int(pos) & 0xffffffff
+        field = il.and_expr(4, il.shift_left(4, operand_value(src, il, addr), il.const(1, int(pos))), il.const(4, mask))
+        kept = il.and_expr(4, operand_value(dst, il, addr), il.const(4, ~mask & 0xffffffff))
+        val = il.or_expr(4, kept, field)
+        set_reg_value(dst.val, il, val)
+        set_logic_flags(dst.val, il, val)
+
+    def lift_ROTL(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
+        sft, src, dst = operands
+        val = operand_value(sft, il, addr)
+        if isinstance(sft, Reg):
+            val = il.and_expr(4, val, il.const(4, 0x1f))
+        val = il.rotate_left(4, operand_value(src, il, addr), val)
+        set_reg_value(dst.val, il, val)
+        # cy is the bit rotated out of bit 31, which is bit 0 of the result
+        set_logic_flags(dst.val, il, val,
+                        cy=lambda result: il.compare_not_equal(4, il.and_expr(4, result, il.const(4, 1)),
+                                                               il.const(4, 0)))
+
+    def lift_LOOP(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
+        counter, disp = operands
+        # reg1 + (-1), the carry is set unless reg1 was 0
+        val = il.add(4, operand_value(counter, il, addr), il.const(4, 0xffffffff), flags="nosat")
+        set_reg_value(counter.val, il, val)
+        c = il.compare_not_equal(4, operand_value(counter, il, addr), il.const(4, 0))
+        self.branch(c, addr - int(disp), addr + length * 2, il)
+
+    def lift_PUSHSP(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
+        # rh is pushed first, rt ends up at the lowest address
+        pushed, slots = list12_frame(tuple(operands[0]))
+        if pushed:
+            il.append(il.set_reg(4, "sp", il.sub(4, il.reg(4, "sp"), il.const(4, pushed))))
+        for name, offset in slots:
+            il.append(il.store(4, sp_offset(il, offset), il.reg(4, name)))
+
+    def lift_POPSP(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
+        pushed, slots = list12_frame(tuple(operands[0]))
+        for name, offset in slots:
+            if name != reg_names[REG.R0]:
+                il.append(il.set_reg(4, name, il.load(4, sp_offset(il, offset))))
+        if pushed:
+            il.append(il.set_reg(4, "sp", sp_offset(il, pushed)))
+
+    def lift_LDL(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
+        src, dst = operands
+        set_reg_value(dst.val, il, il.load(4, reg(src.val, il)))
+
+    def lift_STC(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
+        src, dst = operands
+        il.append(il.store(4, reg(dst.val, il), operand_value(src, il, addr)))
+        # the link is assumed to be held, reg3 reports the store as done
+        set_reg_value(src.val, il, il.const(4, 1))
+
+    def lift_CLL(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
+        il.append(il.intrinsic([], "cll", []))
+
+    def lift_SNOOZE(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
+        il.append(il.intrinsic([], "snooze", []))
+
+    def lift_SYNCI(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
+        il.append(il.intrinsic([], "synci", []))
+
+    def lift_CACHE(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
+        cacheop, mem = operands
+        il.append(il.intrinsic([], "cache", [il.const(1, int(cacheop)), reg(mem.val, il)]))
+
+    def lift_PREF(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
+        prefop, mem = operands
+        il.append(il.intrinsic([], "pref", [il.const(1, int(prefop)), reg(mem.val, il)]))
 
     def lift_LDSR(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
         reg, sreg = operands[:2]
@@ -770,11 +1237,11 @@ class RH850Lifter(V850E2Lifter):
             if sr != SREG_RH850.BSEL:
                 il.append(il.set_reg(4, sr.name.lower(), reg))
         except ValueError:
-            ex = il.intrinsic([], "ldsr", [reg, il.const(1, rID), sel])
+            ex = il.intrinsic([], "ldsr", [reg, il.const(1, rID), il.const(4, sel)])
             il.append(ex)
 
     def lift_STSR(self, mnem, operands, length, addr, il: bn.LowLevelILFunction):
-        sreg, reg = operands
+        sreg, reg = operands[:2]
         rID = int(sreg)
         if len(operands) == 3:
             sel = int(operands[2])
@@ -789,14 +1256,20 @@ class RH850Lifter(V850E2Lifter):
                 sr = il.reg(4, sr.name.lower())
             il.append(il.set_reg(4, reg, sr))
         except ValueError:
-            ex = il.intrinsic([il.reg(4, reg)], "stsr", [il.const(1, rID), sel])
+            ex = il.intrinsic([il.reg(4, reg)], "stsr", [il.const(1, rID), il.const(4, sel)])
             il.append(ex)
 
 
+subarch_lifters = {
+    Subarch.V850: V850Lifter,
+    Subarch.V850E: V850ESLifter,
+    Subarch.V850ES: V850ESLifter,
+    Subarch.V850E2: V850E2Lifter,
+    Subarch.V850E2S: V850E2Lifter,
+    Subarch.V850E2M: V850E2Lifter,
+    Subarch.RH850: RH850Lifter,
+}
+
+
 def choose_lifter(subarch: Subarch):
-    if subarch.value < subarch.V850ES.value:
-        return V850Lifter
-    elif subarch.value < subarch.V850E2.value:
-        return V850ESLifter
-    elif subarch.value < subarch.RH850.value:
-        return V850E2Lifter
+    return subarch_lifters[subarch]
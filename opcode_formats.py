@@ -1,21 +1,74 @@
 from .enums import *
 
 
+class BitField(object):
+    """ specification of an instruction field made of one or more bit ranges
+
+    The parts are given from the most significant to the least significant one and
+    the concatenated value is shifted left by `shift`.
+    Format classes compile every BitField into a property whose getter is
+    straight-line shift/mask code returning a plain int; `ret_type` is only
+    recorded in `field_types` so that the enum wrapping is left to the operands.
+    """
+
+    def __init__(self, parts, shift=0, ret_type=int, doc=None):
+        for hi, lo in parts:
+            assert hi >= lo >= 0
+        self.parts = tuple(parts)
+        self.shift = shift
+        self.ret_type = ret_type
+        self.doc = doc
+
+    def expr(self, var="self"):
+        terms = []
+        pos = self.shift
+        for hi, lo in reversed(self.parts):
+            mask = (1 << (hi - lo + 1)) - 1
+            term = "(%s >> %d & 0x%x)" % (var, lo, mask) if lo else "(%s & 0x%x)" % (var, mask)
+            if pos:
+                term = "%s << %d" % (term, pos)
+            terms.append(term)
+            pos += hi - lo + 1
+        return " | ".join(reversed(terms))
+
+
 def bitfield(hi, lo=0, ret_type=int):
-    assert hi >= lo >= 0
-    bits = hi - lo + 1
-    mask = (1 << bits) - 1
+    def mk(meth):
+        return BitField([(hi, lo)], ret_type=ret_type, doc=getattr(meth, "__doc__", None))
+
+    return mk
 
-    def getter(self):
-        return ret_type((int(self) >> lo) & mask)
 
+def concat_bitfield(*parts, shift=0, ret_type=int):
     def mk(meth):
-        prop = property(fget=getter, doc=getattr(meth, "__doc__", None))
-        return prop
+        return BitField(parts, shift=shift, ret_type=ret_type, doc=getattr(meth, "__doc__", None))
 
     return mk
 
 
+def compile_fields(cls):
+    """ replace the BitFields of a Format class with generated getters, and build `cls.unpack`
+
+    The getters and `unpack` return plain ints, the `ret_type` of a field is not applied but only
+    recorded in `cls.field_types`, wrapping the values (REG, COND, ...) is left to the callers.
+    """
+    fields = dict(getattr(cls, "bit_fields", {}))
+    for name, field in list(vars(cls).items()):
+        if isinstance(field, BitField):
+            fields[name] = field
+            ns = {}
+            exec("def %s(self):\n    return %s\n" % (name, field.expr()), ns)
+            setattr(cls, name, property(fget=ns[name], doc=field.doc))
+    cls.bit_fields = fields
+    cls.field_types = {name: field.ret_type for name, field in fields.items()}
+    cls.field_names = tuple(fields)
+    src = "def unpack(code):\n    return (%s,)\n" % ", ".join(f.expr("code") for f in fields.values())
+    ns = {}
+    exec(src, ns)
+    cls.unpack = staticmethod(ns["unpack"])
+    return cls
+
+
 def list12(l12: int):
     reg_list = map(REG, [30, 31, 29, 28, 23, 22, 21, 20, 27, 26, 25, 24])
     l = []
@@ -26,7 +79,15 @@ def list12(l12: int):
     return l
 
 
+# the sorted registers of every list12 mask
+list12_table = [tuple(list12(mask)) for mask in range(0x1000)]
+
+
 class Format(int):
+    def __init_subclass__(cls, **kw):
+        super().__init_subclass__(**kw)
+        compile_fields(cls)
+
     def __getitem__(self, key):
         if isinstance(key, slice):
             assert key.step is None
@@ -41,7 +102,7 @@ class Format(int):
         assert hi >= lo >= 0
         bits = hi - lo + 1
         mask = (1 << bits) - 1
-        return (int(self) >> lo) & mask
+        return (self >> lo) & mask
 
     @bitfield(hi=15, lo=11)
     def hi5(self):
@@ -79,9 +140,9 @@ class Format(int):
     def ext_opcode_lo(self):
         pass
 
-    @property
+    @concat_bitfield((25, 23), (22, 21))
     def ext_opcode(self):
-        return self.ext_opcode_hi << 2 | self.ext_opcode_lo
+        pass
 
     @bitfield(hi=31, lo=27)
     def ext_hi5(self):
@@ -100,6 +161,9 @@ class Format(int):
         pass
 
 
+compile_fields(Format)
+
+
 class FormatI(Format):
     @bitfield(hi=4, lo=0, ret_type=REG)
     def reg1(self):
@@ -125,17 +189,9 @@ class FormatIII(Format):
     def cond(self):
         pass
 
-    @bitfield(hi=6, lo=4)
-    def _disp_lo(self):
-        pass
-
-    @bitfield(hi=15, lo=11)
-    def _disp_hi(self):
-        pass
-
-    @property
+    @concat_bitfield((15, 11), (6, 4), shift=1)
     def disp9(self):
-        return (self._disp_hi << 4) | (self._disp_lo << 1)
+        pass
 
 
 class FormatIV7(Format):
@@ -183,35 +239,19 @@ class FormatV(Format):
 
     opcode_lo_width = 1
 
-    @bitfield(hi=5, lo=0)
-    def _disp_hi(self):
-        pass
-
-    @bitfield(hi=31, lo=16)
-    def _disp_lo(self):
-        pass
-
-    @property
+    @concat_bitfield((5, 0), (31, 16))
     def disp22(self):
-        return self._disp_hi << 16 | self._disp_lo
+        pass
 
 
 class FormatVI(FormatI):
     @bitfield(hi=31, lo=16)
-    def _imm_lo(self):
-        pass
-
-    @bitfield(hi=47, lo=32)
-    def _imm_hi(self):
-        pass
-
-    @property
     def imm16(self):
-        return self._imm_lo
+        pass
 
-    @property
+    @concat_bitfield((47, 32), (31, 16))
     def imm32(self):
-        return self._imm_hi << 16 | self._imm_lo
+        pass
 
 
 class FormatVII(FormatI):
@@ -281,51 +321,35 @@ class FormatXII(Format):
     def sub_opcode(self):
         pass
 
-    @bitfield(hi=22, lo=18)
-    def _imm_hi(self):
-        pass
-
-    @property
+    @concat_bitfield((22, 18), (4, 0))
     def imm10(self):
-        return self._imm_hi << 5 | self.lo5
+        pass
 
 
 class FormatXIII(Format):
-    @bitfield(hi=4, lo=1)
+    @bitfield(hi=5, lo=1)
     def imm5(self):
         pass
 
-    @bitfield(hi=0, lo=0)
-    def _list12_0(self):
-        pass
-
-    @bitfield(hi=31, lo=21)
-    def _list12(self):
+    @concat_bitfield((31, 21), (0, 0))
+    def list12_mask(self):
         pass
 
     @property
     def reg_list(self):
-        return list12(self._list12 << 1 | self._list12_0)
+        return list12_table[self.list12_mask]
 
     @bitfield(hi=20, lo=16, ret_type=REG)
     def reg2(self):
         pass
 
     @bitfield(hi=47, lo=32)
-    def _imm16_lo(self):
-        pass
-
-    @bitfield(hi=63, lo=48)
-    def _imm16_hi(self):
-        pass
-
-    @property
     def imm16(self):
-        return self._imm16_lo
+        pass
 
-    @property
+    @concat_bitfield((63, 48), (47, 32))
     def imm32(self):
-        return self._imm16_hi << 16 | self._imm16_lo
+        pass
 
 
 class FormatXIV(Format):
@@ -341,17 +365,9 @@ class FormatXIV(Format):
     def sub_opcode(self):
         pass
 
-    @bitfield(hi=26, lo=20)
-    def _disp_lo(self):
-        pass
-
-    @bitfield(hi=47, lo=32)
-    def _disp_hi(self):
-        pass
-
-    @property
+    @concat_bitfield((47, 32), (26, 20))
     def disp23(self):
-        return self._disp_hi << 7 | self._disp_lo
+        pass
 
 
 class FormatF(Format):
@@ -359,7 +375,7 @@ class FormatF(Format):
     def reg1(self):
         pass
 
-    @bitfield(hi=20, lo=16, ret_type=REG)
+    @bitfield(hi=15, lo=11, ret_type=REG)
     def reg2(self):
         pass
 
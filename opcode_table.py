@@ -1,20 +1,19 @@
 from .opcode_formats import Format, FormatI, FormatII, FormatIII, FormatIV7, FormatIV4, FormatV, FormatF
 from .opcode_formats import FormatVI, FormatVII, FormatVIII, FormatIX, FormatX, FormatXI, FormatXII, FormatXIII
 from .opcode_formats import FormatXIV
-from .enums import MNEM, REG as REG, Subarch, check_subarch
+from .enums import MNEM, REG as REG, COND, BRANCH, Subarch, mnem_validity
+from array import array
+
 from .operand import *
+from .cache import LRUCache
 
 
-def bs2int(bs: bytes, endianess=0) -> int:
-    bs = (bs + b"\x00" * 8)[:8]
-    indices = range(8)
+def bs2int(bs, endianess=0) -> int:
+    """ the first 8 bytes of bs (bytes, bytearray or memoryview) as an integer, zero padded """
+    bs = bs[:8]
     if not endianess:
-        indices = reversed(indices)
-    r = 0
-    for i in indices:
-        r <<= 8
-        r |= bs[i]
-    return r
+        return int.from_bytes(bs, "little")
+    return int.from_bytes(bs, "big") << (8 * (8 - len(bs)))
 
 
 def invalid(size=1):
@@ -31,12 +30,39 @@ def undef(size=1):
     return f
 
 
+class DecodedInstruction(object):
+    """ immutable decoding result: the mnemonic, the operand tuple and the length in halfwords
+
+    Instances are shared between callers (the dispatch table and the decode cache),
+    so neither the record nor its operands may be modified.
+    """
+    __slots__ = ("mnem", "operands", "length")
+
+    def __init__(self, mnem, operands, length):
+        object.__setattr__(self, "mnem", mnem)
+        object.__setattr__(self, "operands", tuple(operands))
+        object.__setattr__(self, "length", length)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is immutable" % type(self).__name__)
+
+    def __delattr__(self, name):
+        raise AttributeError("%s is immutable" % type(self).__name__)
+
+    def __iter__(self):
+        return iter((self.mnem, self.operands, self.length))
+
+    def __repr__(self):
+        return "%s(%s, %r, %d)" % (type(self).__name__, self.mnem.name, self.operands, self.length)
+
+
 class DecoderContext(object):
     def __init__(self, subarch=Subarch.V850E2M, **kw):
         self.subarch = subarch
+        self.valid = mnem_validity[subarch]
 
     def check_mnem(self, mnem):
-        return check_subarch(self.subarch, mnem)
+        return self.valid[mnem]
 
 
 def subtable00(cxt: DecoderContext, fmt: Format):
@@ -84,10 +110,8 @@ def subtable03(cxt: DecoderContext, fmt: Format):
     else:
         disp4 = fmt[3:0]
         if fmt.bit4:
-            mnem = MNEM.SLD_HU
-        else:
-            mnem = MNEM.SLD_BU
-        return mnem, [EpBasedMem(disp4, width=4, signed=False), Reg(fmt.hi5)], 1
+            return MNEM.SLD_HU, [EpBasedMem(disp4 << 1, width=5, signed=False), Reg(fmt.hi5)], 1
+        return MNEM.SLD_BU, [EpBasedMem(disp4, width=4, signed=False), Reg(fmt.hi5)], 1
 
 
 subtable0 = [
@@ -281,23 +305,22 @@ def subtable7(cxt: DecoderContext, fmt: Format):
 def subtable8(cxt: DecoderContext, fmt: Format):
     """ SLD.H """
     fmt = FormatIV7(fmt)
-    return MNEM.SLD_B, [EpBasedMem(fmt.disp7, width=7, signed=False), Reg(fmt.reg2)], 1
+    return MNEM.SLD_H, [EpBasedMem(fmt.disp7 << 1, width=8, signed=False), Reg(fmt.reg2)], 1
 
 
 def subtable9(cxt: DecoderContext, fmt: Format):
     """ SST.H """
     fmt = FormatIV7(fmt)
-    return MNEM.SST_B, [Reg(fmt.reg2), EpBasedMem(fmt.disp7, width=7, signed=False)], 1
+    return MNEM.SST_H, [Reg(fmt.reg2), EpBasedMem(fmt.disp7 << 1, width=8, signed=False)], 1
 
 
 def subtableA(cxt: DecoderContext, fmt: Format):
+    """ SLD.W | SST.W """
     fmt = FormatIV7(fmt)
-    if fmt.sub_opcode:
-        mnem = MNEM.SST_W
-    else:
-        mnem = MNEM.SLD_W
     disp8 = fmt.disp6 << 2
-    return mnem, [EpBasedMem(disp8, width=8, signed=False), Reg(fmt.reg2)], 1
+    if fmt.sub_opcode:
+        return MNEM.SST_W, [Reg(fmt.reg2), EpBasedMem(disp8, width=8, signed=False)], 1
+    return MNEM.SLD_W, [EpBasedMem(disp8, width=8, signed=False), Reg(fmt.reg2)], 1
 
 
 def subtableB(cxt: DecoderContext, fmt: Format):
@@ -328,7 +351,7 @@ def subtableC2(cxt: DecoderContext, fmt: Format):
     else:
         fmt = FormatXIII(fmt)
         operands = [Imm(fmt.imm5, width=5, signed=False), RegList(fmt.reg_list)]
-        if fmt.reg2.value:
+        if fmt.reg2:
             operands += [Reg(fmt.reg2)]
         return MNEM.DISPOSE, operands, 2
 
@@ -341,7 +364,7 @@ def subtableC3(cxt: DecoderContext, fmt: Format):
     else:
         fmt = FormatXIII(fmt)
         operands = [Imm(fmt.imm5, width=5, signed=False), RegList(fmt.reg_list)]
-        if fmt.reg2.value:
+        if fmt.reg2:
             operands += [Reg(fmt.reg2)]
         return MNEM.DISPOSE, operands, 2
 
@@ -451,11 +474,13 @@ def subtableF0(cxt: DecoderContext, fmt: Format):
                     operands.append(Reg(REG.SP))
                 elif f == 1:
                     operands.append(Imm(fmt.imm16, width=16, signed=True))
+                    size = 3
                 elif f == 2:
                     operands.append(Imm(fmt.imm16 << 16, width=32, signed=False))
+                    size = 3
                 elif f == 3:
                     operands.append(Imm(fmt.imm32, width=32))
-                    size = 3
+                    size = 4
                 return MNEM.PREPARE, operands, size
             else:
                 fmt = FormatXIV(fmt)
@@ -506,11 +531,13 @@ def subtableF1(cxt: DecoderContext, fmt: Format):
                     operands.append(Reg(REG.SP))
                 elif f == 1:
                     operands.append(Imm(fmt.imm16, width=16, signed=True))
+                    size = 3
                 elif f == 2:
                     operands.append(Imm(fmt.imm16 << 16, width=32, signed=False))
+                    size = 3
                 elif f == 3:
                     operands.append(Imm(fmt.imm32, width=32))
-                    size = 3
+                    size = 4
                 return MNEM.PREPARE, operands, size
             else:
                 fmt = FormatXIV(fmt)
@@ -581,7 +608,7 @@ def ext_subtable01(cxt: DecoderContext, fmt: Format):
     if fmt.ext_lo5 == 0:
         if fmt.ext_hi5 == 0:
             return MNEM.LDSR, [Reg(fmt.lo5), SReg(fmt.hi5)], 2
-        elif cxt.subarch.value >= Subarch.RH850:
+        elif cxt.subarch.value >= Subarch.RH850.value:
             return MNEM.LDSR, [Reg(fmt.lo5), SReg(fmt.hi5), Imm(fmt.ext_hi5, width=5, signed=False)], 2
     return MNEM.INVALID_CODE, [], 2
 
@@ -591,7 +618,7 @@ def ext_subtable02(cxt: DecoderContext, fmt: Format):
     if fmt.ext_lo5 == 0:
         if fmt.ext_hi5 == 0:
             return MNEM.STSR, [SReg(fmt.lo5), Reg(fmt.hi5)], 2
-        elif cxt.subarch.value >= Subarch.RH850:
+        elif cxt.subarch.value >= Subarch.RH850.value:
             return MNEM.STSR, [SReg(fmt.lo5), Reg(fmt.hi5), Imm(fmt.ext_hi5, width=5, signed=False)], 2
     return MNEM.INVALID_CODE, [], 2
 
@@ -641,7 +668,7 @@ def ext_subtable11(cxt: DecoderContext, fmt: Format):
         msb += 16
         pos = lsb
         wid = msb - pos + 1
-        return MNEM.BINS, [Reg(fmt.lo5), Imm(wid, width=5, signed=False), Imm(pos, width=5, signed=False),
+        return MNEM.BINS, [Reg(fmt.lo5), Imm(wid, width=6, signed=False), Imm(pos, width=5, signed=False),
                            Reg(fmt.hi5)], 2
     return MNEM.INVALID_CODE, [], 2
 
@@ -724,10 +751,10 @@ def ext_subtable23(cxt: DecoderContext, fmt: Format):
     if fmt.lo5 == 0 and fmt.ext_hi5 == 0 and fmt.ext_lo5 == 0:
         ff_hi = fmt[15:14]
         ff_lo = fmt[13:11]
-        mnem = [[MNEM.DI] + [MNEM.UNDEF_CODE] * 3,
-                [MNEM.UNDEF_CODE] * 4,
-                [MNEM.EI] + [MNEM.UNDEF_CODE] * 3,
-                [MNEM.UNDEF_CODE] * 4,
+        mnem = [[MNEM.DI] + [MNEM.UNDEF_CODE] * 7,
+                [MNEM.UNDEF_CODE] * 8,
+                [MNEM.EI] + [MNEM.UNDEF_CODE] * 7,
+                [MNEM.UNDEF_CODE] * 8,
                 ][ff_hi][ff_lo]
         return mnem, [], 2
     elif fmt.hi5 == 0x1a and fmt[31:30] == 0 and fmt.ext_lo5 == 0:
@@ -880,7 +907,7 @@ def ext_subtable63(cxt: DecoderContext, fmt: Format):
     if fmt.lo5 == 0 and fmt[20:19] == 0:
         fmt = FormatIX(fmt)
         ff = fmt[18:17]
-        mnem = [MNEM.SCH0R, MNEM.SCH1R, MNEM.SCH0L, MNEM.SCH1L]
+        mnem = [MNEM.SCH0R, MNEM.SCH1R, MNEM.SCH0L, MNEM.SCH1L][ff]
         return mnem, [Reg(fmt.reg2), Reg(fmt.ext_hi5)], 2
     elif fmt.hi5 == 0 and fmt.ext_lo5 == 0x18:
         fmt = FormatVII(fmt)
@@ -990,15 +1017,15 @@ def fp_type01(cxt: DecoderContext, fmt: FormatF):
     fcbit = fmt[19:17]
     operands = [FCond(fmt[30:27])]
     if fmt[31] == 0 and fmt[20] == 0:
-        mnem = MNEM.CMOVF_S
+        mnem = MNEM.CMPF_S
         operands += [Reg(fmt.reg2), Reg(fmt.reg1)]
         if fcbit:
             operands.append(Imm(fcbit, width=3, signed=False))
     elif fmt[31] == 0 and fmt[11] == 0 and fmt[0] == 0:
-        mnem = MNEM.CMOVF_D
-        operands += [RegPair(fmt.reg1), RegPair(fmt.reg2)]
+        mnem = MNEM.CMPF_D
+        operands += [RegPair(fmt.reg2), RegPair(fmt.reg1)]
         if fcbit:
-            operands.append(Imm(fcbit, width=4, signed=False))
+            operands.append(Imm(fcbit, width=3, signed=False))
     else:
         mnem = MNEM.INVALID_CODE
         operands = []
@@ -1028,7 +1055,7 @@ def fp_type02_0(cxt: DecoderContext, fmt: FormatF):
         if fmt[4] == 0 and (b11 or fmt[11] == 0) and (b27 or fmt[27] == 0):
             return mnem
     elif subop == 0x7:
-        mnem, b11, b27 = [(MNEM.SQRTF_S, True, True), (MNEM.SQRT_D, False, False)][fmt[20]]
+        mnem, b11, b27 = [(MNEM.SQRTF_S, True, True), (MNEM.SQRTF_D, False, False)][fmt[20]]
         if fmt[4] == 0 and (b11 or fmt[11] == 0) and (b27 or fmt[27] == 0):
             return mnem
 
@@ -1112,7 +1139,7 @@ def fp_type02_2(cxt: DecoderContext, fmt: FormatF):
         elif fmt[4] == 0 and fmt[20] == 0:
             return MNEM.CVTF_HS
     elif subop == 7:
-        mnem, b11, b27 = [(MNEM.RSQRTF_S, True, True), (MNEM.RSQRT_D, False, False)][fmt[20]]
+        mnem, b11, b27 = [(MNEM.RSQRTF_S, True, True), (MNEM.RSQRTF_D, False, False)][fmt[20]]
         if fmt[4] == 0 and (b11 or fmt[11] == 0) and (b27 or fmt[27] == 0):
             return mnem
 
@@ -1135,10 +1162,10 @@ def fp_type02_3(cxt: DecoderContext, fmt: FormatF):
     if subop == 0 or subop == 2:
         # FLOORF
         sel = fmt[4] << 2 | fmt[20] << 1 | fmt[18]
-        mnem, b11, b27 = [(MNEM.FLOORF_SW, True, True), (MNEM.FLOOR_SL, True, False),
+        mnem, b11, b27 = [(MNEM.FLOORF_SW, True, True), (MNEM.FLOORF_SL, True, False),
                           (MNEM.FLOORF_DW, False, True), (MNEM.FLOORF_DL, False, False),
-                          (MNEM.FLOORF_SUW, True, True), (MNEM.FLOOR_SUL, True, False),
-                          (MNEM.FLOORF_DUW, False, True), (MNEM.FLOOR_DUL, False, False)][sel]
+                          (MNEM.FLOORF_SUW, True, True), (MNEM.FLOORF_SUL, True, False),
+                          (MNEM.FLOORF_DUW, False, True), (MNEM.FLOORF_DUL, False, False)][sel]
         if (b11 or fmt[11] == 0) and (b27 or fmt[27] == 0):
             return mnem
     elif subop == 1:
@@ -1171,6 +1198,15 @@ def fp_type02_4(cxt: DecoderContext, fmt: FormatF):
             return mnem
 
 
+fp_type02_subtables = [
+    fp_type02_0,
+    fp_type02_1,
+    fp_type02_2,
+    fp_type02_3,
+    fp_type02_4,
+] + [None] * 11
+
+
 def fp_type02(cxt: DecoderContext, fmt: FormatF):
     """  FP-mnem reg2, reg3 """
     operands = [Reg(fmt.reg2), Reg(fmt.reg3)]
@@ -1238,17 +1274,7 @@ def fp_type02(cxt: DecoderContext, fmt: FormatF):
     #  r  w 00010  00010   CVTF.HS
     #  r  w 00011  00010   CVTF.SH
 
-    subop = fmt[3:0]  # [4:0]?
-    fp_type02_subtables = [
-        fp_type02_0,
-        fp_type02_1,
-        fp_type02_2,
-        fp_type02_3,
-        fp_type02_4,
-        None,
-        None,
-        None,
-    ]
+    subop = fmt[3:0]  # bit 4 selects the unsigned variants
     tbl = fp_type02_subtables[subop]
     if tbl is not None:
         mnem = tbl(cxt, fmt)
@@ -1359,16 +1385,372 @@ decode_table = [
 ]
 
 
-def decode(bs, subarch=Subarch.V850E2M, **kw):
-    code = bs2int(bs)
-    fmt = Format(code)
-    cxt = DecoderContext(subarch=subarch, **kw)
+def lookup_subtable(fmt: Format):
     tbl = decode_table[fmt.opcode_hi]
     if type(tbl) is list:
         tbl = tbl[fmt.opcode_lo]
-    mnem, operands, length = tbl(cxt, fmt)
-    assert isinstance(mnem, MNEM), "%s" % mnem
-    if not cxt.check_mnem(mnem):
-        mnem = MNEM.INVALID_CODE
-        operands = []
-    return mnem, operands, length
+    return tbl
+
+
+def max_code_size(fmt: Format):
+    """ the number of bytes the subtable handler of the first halfword may read """
+    if fmt.opcode_hi <= 0xb:
+        if fmt.opcode_hi == 0x5 and fmt.opcode_lo == 3 and not fmt.hi5:
+            return 6  # JR | JARL disp32
+        return 2
+    elif fmt.opcode_hi == 0xc and fmt.opcode_lo == 1 and not fmt.hi5:
+        return 6  # MOV imm32
+    elif fmt.opcode_hi == 0xd and fmt.opcode_lo == 3 and not fmt.hi5:
+        return 6  # JMP disp32
+    elif fmt.opcode_hi == 0xf and fmt.opcode_lo <= 1:
+        return 8  # PREPARE imm32 | LD/ST disp23
+    return 4
+
+
+def second_halfword_mask(fmt: Format):
+    """ the bits of the second halfword the mnemonic and the length depend on """
+    if fmt.opcode_hi <= 0xb:
+        return 0
+    elif fmt.opcode_hi == 0xd:
+        return 0x1 if fmt.opcode_lo == 3 and not fmt.hi5 else 0  # JMP | LOOP
+    elif fmt.opcode_hi == 0xe:
+        return 0x1 if fmt.opcode_lo & 1 else 0  # LD.H | LD.W, ST.H | ST.W
+    elif fmt.opcode_hi == 0xf:
+        if fmt.opcode_lo <= 1:
+            return 0x1 if fmt.hi5 else 0x1f  # JARL | LD.BU, PREPARE | LD/ST disp23
+        elif fmt.opcode_lo == 3:
+            return 0xffff  # extended and FPU opcodes
+    return 0
+
+
+def length_mask(fmt: Format):
+    """ the bits of the second halfword the instruction length depends on, all within its low 5 bits """
+    if fmt.opcode_hi == 0xd and fmt.opcode_lo == 3 and not fmt.hi5:
+        return 0x1  # JMP disp32 | LOOP
+    elif fmt.opcode_hi == 0xf and fmt.opcode_lo <= 1 and not fmt.hi5:
+        return 0x1f  # JR disp22 | PREPARE | LD/ST disp23
+    return 0
+
+
+def build_dispatch_table():
+    """ evaluate the opcode dispatch for every possible first halfword
+
+    16-bit instructions (format I-IV) are fully resolved to a DecodedInstruction,
+    all the others map to the subtable handler which decodes the whole instruction word.
+    Returns the dispatch table, the number of bytes to read and the second halfword mask for each first halfword.
+    """
+    cxt = DecoderContext()
+    table = []
+    sizes = []
+    masks = []
+    for hw in range(0x10000):
+        fmt = Format(hw)
+        tbl = lookup_subtable(fmt)
+        if fmt.opcode_hi <= 0xb:
+            mnem, operands, length = tbl(cxt, fmt)
+            if length == 1:
+                tbl = DecodedInstruction(mnem, operands, length)
+        table.append(tbl)
+        sizes.append(max_code_size(fmt))
+        masks.append(second_halfword_mask(fmt))
+    return table, sizes, masks
+
+
+dispatch_table, code_size, second_halfword_masks = build_dispatch_table()
+
+
+def build_key_sizes():
+    """ the byte length of the instruction starting with each first halfword
+
+    Where it depends on the second halfword the entry is a tuple indexed by its low 5 bits.
+    """
+    cxt = DecoderContext()
+    sizes = []
+    for hw, entry in enumerate(dispatch_table):
+        if type(entry) is DecodedInstruction:
+            sizes.append(entry.length * 2)
+            continue
+        mask = length_mask(Format(hw))
+        lengths = tuple(entry(cxt, Format(hw | (low5 & mask) << 16))[2] * 2 for low5 in range(0x20))
+        sizes.append(lengths if mask else lengths[0])
+    return sizes
+
+
+key_sizes = build_key_sizes()
+
+subarch_dispatch_tables = {}
+
+# the subarchs implementing every mnemonic, they use dispatch_table as is and their decoders skip the validity check
+complete_subarchs = frozenset(subarch for subarch, valid in mnem_validity.items()
+                              if all(valid[mnem] for mnem in MNEM if mnem > MNEM.UNDEF_CODE))
+
+
+def get_dispatch_table(subarch: Subarch):
+    """ the dispatch table with the resolved entries checked against subarch
+
+    Mnemonics subarch does not implement are replaced by a shared MNEM.INVALID_CODE record,
+    so the resolved entries of the returned table need no further check.
+    """
+    table = subarch_dispatch_tables.get(subarch)
+    if table is None and subarch in complete_subarchs:
+        table = subarch_dispatch_tables[subarch] = dispatch_table
+    elif table is None:
+        valid = mnem_validity[subarch]
+        rejected = {}
+        table = list(dispatch_table)
+        for hw, entry in enumerate(table):
+            if type(entry) is DecodedInstruction and not valid[entry.mnem]:
+                if entry.length not in rejected:
+                    rejected[entry.length] = DecodedInstruction(MNEM.INVALID_CODE, (), entry.length)
+                table[hw] = rejected[entry.length]
+        subarch_dispatch_tables[subarch] = table
+    return table
+
+
+def build_decoder(subarch: Subarch):
+    """ decode() specialised to subarch, with its dispatch table and a DecoderContext bound once
+
+    The decoders of complete_subarchs only map the invalid and undefined code to MNEM.INVALID_CODE.
+    """
+    table = get_dispatch_table(subarch)
+    cxt = DecoderContext(subarch=subarch)
+    sizes = code_size
+
+    if subarch in complete_subarchs:
+        def decode_subarch(bs):
+            hw = int.from_bytes(bs[:2], "little")
+            entry = table[hw]
+            if type(entry) is DecodedInstruction:
+                return entry
+            mnem, operands, length = entry(cxt, Format(int.from_bytes(bs[:sizes[hw]], "little")))
+            assert isinstance(mnem, MNEM), "%s" % mnem
+            if mnem <= MNEM.UNDEF_CODE:
+                return DecodedInstruction(MNEM.INVALID_CODE, (), length)
+            return DecodedInstruction(mnem, operands, length)
+    else:
+        valid = cxt.valid
+
+        def decode_subarch(bs):
+            hw = int.from_bytes(bs[:2], "little")
+            entry = table[hw]
+            if type(entry) is DecodedInstruction:
+                return entry
+            mnem, operands, length = entry(cxt, Format(int.from_bytes(bs[:sizes[hw]], "little")))
+            assert isinstance(mnem, MNEM), "%s" % mnem
+            if not valid[mnem]:
+                return DecodedInstruction(MNEM.INVALID_CODE, (), length)
+            return DecodedInstruction(mnem, operands, length)
+
+    return decode_subarch
+
+
+subarch_decoders = {}
+
+
+def get_decoder(subarch: Subarch):
+    decoder = subarch_decoders.get(subarch)
+    if decoder is None:
+        decoder = subarch_decoders[subarch] = build_decoder(subarch)
+    return decoder
+
+
+# the complete subarchs share dispatch_table, their decoders cost nothing to build ahead
+for _subarch in complete_subarchs:
+    get_decoder(_subarch)
+del _subarch
+
+
+def decode(bs, subarch=Subarch.V850E2M, **kw):
+    return (subarch_decoders.get(subarch) or get_decoder(subarch))(bs)
+
+
+# what a subtable handler raises on an encoding it does not cover, the sweeps record it as invalid code
+decode_errors = (IndexError, ValueError, AssertionError)
+
+
+class DecodedRange(object):
+    """ struct-of-arrays result of a linear sweep
+
+    addrs   -- address of each instruction
+    lengths -- length of each instruction in bytes (2 for invalid code)
+    mnems   -- MNEM value of each instruction
+    codes   -- the instruction word truncated to its length, i.e. the packed operand fields;
+               use Format(code) or the Format*.unpack() extractors to get them back
+    """
+    __slots__ = ("addrs", "lengths", "mnems", "codes")
+
+    def __init__(self):
+        self.addrs = array("Q")
+        self.lengths = array("B")
+        self.mnems = array("H")
+        self.codes = array("Q")
+
+    def __len__(self):
+        return len(self.addrs)
+
+    def extend(self, other):
+        self.addrs.extend(other.addrs)
+        self.lengths.extend(other.lengths)
+        self.mnems.extend(other.mnems)
+        self.codes.extend(other.codes)
+
+
+def iter_decode_range(buffer, start=0, end=None, subarch=Subarch.V850E2M, base=0, chunk_size=0x10000):
+    """ linear sweep over buffer[start:end], yielding a DecodedRange for each chunk_size bytes
+
+    Invalid code is recorded as MNEM.INVALID_CODE of 2 bytes and the sweep resumes at the next halfword.
+    Addresses are reported as base + offset in the buffer.
+    """
+    mv = memoryview(buffer)
+    if end is None:
+        end = len(mv)
+    cxt = DecoderContext(subarch=subarch)
+    valid = cxt.valid
+    table = get_dispatch_table(subarch)
+    sizes = code_size
+    invalid_code = MNEM.INVALID_CODE
+    off = start
+    while off + 1 < end:
+        chunk = DecodedRange()
+        addrs, lengths, mnems, codes = chunk.addrs, chunk.lengths, chunk.mnems, chunk.codes
+        chunk_end = min(off + chunk_size, end)
+        while off + 1 < chunk_end:
+            hw = mv[off] | mv[off + 1] << 8
+            entry = table[hw]
+            if type(entry) is DecodedInstruction:
+                mnem, length = entry.mnem, entry.length
+                code = hw
+            else:
+                code = int.from_bytes(mv[off:off + sizes[hw]], "little")
+                try:
+                    mnem, _, length = entry(cxt, Format(code))
+                except decode_errors:
+                    mnem, length = invalid_code, 1
+            size = length * 2
+            if off + size > end or not valid[mnem]:
+                mnem, size = invalid_code, 2
+            if size < 8:
+                code &= (1 << (size * 8)) - 1
+            addrs.append(base + off)
+            lengths.append(size)
+            mnems.append(mnem)
+            codes.append(code)
+            off += size
+        yield chunk
+
+
+def decode_range(buffer, start=0, end=None, subarch=Subarch.V850E2M, base=0, chunk_size=0x10000):
+    """ decode every instruction of buffer[start:end] by a linear sweep into a single DecodedRange """
+    ret = DecodedRange()
+    for chunk in iter_decode_range(buffer, start, end, subarch=subarch, base=base, chunk_size=chunk_size):
+        ret.extend(chunk)
+    return ret
+
+
+decode_cache = LRUCache(maxsize=0x4000)
+
+
+def cache_key(bs, subarch):
+    """ (subarch, bytes of the instruction at the start of bs), the key of the per-instruction caches """
+    size = key_sizes[int.from_bytes(bs[:2], "little")]
+    if type(size) is tuple:
+        size = size[bs[2] & 0x1f if len(bs) > 2 else 0]
+    return subarch, bytes(bs[:size])
+
+
+def decode_cached(bs, subarch=Subarch.V850E2M):
+    """ decode() through the shared LRU cache keyed by (subarch, instruction bytes)
+
+    The DecodedInstruction is shared between callers.
+    Use decode_cache.resize() to change the cache size (0 disables caching).
+    """
+    key = cache_key(bs, subarch)
+    ret = decode_cache.get(key)
+    if ret is None:
+        ret = decode(bs, subarch=subarch)
+        decode_cache.put(key, ret)
+    return ret
+
+
+# mnemonics get_instruction_info reports branches for
+branch_mnems = [False] * (max(MNEM) + 1)
+for _mnem in (MNEM.JMP, MNEM.JR, MNEM.JARL, MNEM.B, MNEM.LOOP, MNEM.SWITCH, MNEM.SYSCALL, MNEM.DISPOSE,
+              MNEM.DBTRAP, MNEM.TRAP, MNEM.FETRAP, MNEM.RIE, MNEM.HALT,
+              MNEM.RETI, MNEM.DBRET, MNEM.FERET, MNEM.EIRET, MNEM.CTRET):
+    branch_mnems[_mnem] = True
+del _mnem
+
+exception_mnems = {MNEM.DBTRAP, MNEM.TRAP, MNEM.FETRAP, MNEM.RIE, MNEM.HALT}
+return_mnems = {MNEM.RETI, MNEM.DBRET, MNEM.FERET, MNEM.EIRET, MNEM.CTRET}
+
+# (mnemonic, length) of the instructions longer than a halfword,
+# by subarch and the first halfword with the bits of the second one selected by second_halfword_masks
+classify_cache = LRUCache(maxsize=0x4000)
+
+
+def branch_class(insn: DecodedInstruction):
+    """ (BRANCH, raw target) of a decoded instruction """
+    mnem, operands = insn.mnem, insn.operands
+    if mnem == MNEM.B:
+        op = operands[1]
+        if isinstance(op, RelJump):
+            return (BRANCH.JUMP_REL if operands[0].val == COND.R else BRANCH.COND_REL), int(op)
+    elif mnem == MNEM.JR:
+        op = operands[0]
+        if isinstance(op, RelJump):
+            return BRANCH.JUMP_REL, int(op)
+    elif mnem == MNEM.JARL:
+        op = operands[0]
+        if isinstance(op, RelJump):
+            return (BRANCH.CALL_REL if operands[1].val == REG.LP else BRANCH.JUMP_REL), int(op)
+    elif mnem == MNEM.JMP:
+        op = operands[0]
+        if isinstance(op, RegJump):
+            if op.val == REG.R0:
+                return BRANCH.JUMP, 0
+            elif op.val == REG.LP:
+                return BRANCH.RETURN, None
+            return BRANCH.UNRESOLVED, None
+        elif isinstance(op, BasedJump):
+            if op.base == REG.R0:
+                return BRANCH.JUMP, int(op.disp)
+            return BRANCH.UNRESOLVED, None
+    elif mnem == MNEM.LOOP:
+        return BRANCH.COND_REL, -int(operands[1])
+    elif mnem == MNEM.SWITCH:
+        return BRANCH.UNRESOLVED, None
+    elif mnem == MNEM.SYSCALL:
+        return BRANCH.SYSCALL, None
+    elif mnem in exception_mnems:
+        return BRANCH.EXCEPTION, None
+    elif mnem in return_mnems:
+        return BRANCH.RETURN, None
+    elif mnem == MNEM.DISPOSE:
+        if len(operands) == 3:
+            return (BRANCH.RETURN if operands[2].val == REG.LP else BRANCH.UNRESOLVED), None
+    return BRANCH.NONE, None
+
+
+def classify(bs, subarch=Subarch.V850E2M):
+    """ (length in bytes, BRANCH, raw target) of the instruction at the start of bs, length 0 for invalid code
+
+    Only the branches are decoded. The length and mnemonic of the other instructions come from the
+    dispatch table for 16-bit instructions and from classify_cache for the longer ones.
+    """
+    hw = int.from_bytes(bs[:2], "little")
+    table = subarch_dispatch_tables.get(subarch) or get_dispatch_table(subarch)
+    entry = table[hw]
+    if type(entry) is DecodedInstruction:
+        if not branch_mnems[entry.mnem]:
+            return (0 if entry.mnem == MNEM.INVALID_CODE or entry.mnem == MNEM.UNDEF_CODE else 2), BRANCH.NONE, None
+        return (2,) + branch_class(entry)
+    key = (subarch, hw | (int.from_bytes(bs[2:4], "little") & second_halfword_masks[hw]) << 16)
+    cached = classify_cache.get(key)
+    if cached is None:
+        insn = decode_cached(bs, subarch=subarch)
+        cached = insn.mnem, insn.length * 2
+        classify_cache.put(key, cached)
+    mnem, length = cached
+    if not branch_mnems[mnem]:
+        return (0 if mnem == MNEM.INVALID_CODE or mnem == MNEM.UNDEF_CODE else length), BRANCH.NONE, None
+    return (length,) + branch_class(decode_cached(bs, subarch=subarch))
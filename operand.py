@@ -5,6 +5,8 @@ from .visitor import Visitable
 ## Operand
 
 class Operand(Visitable):
+    __slots__ = ()
+
     class Visitor(Visitable.Visitor):
         pass
 
@@ -13,6 +15,7 @@ class Operand(Visitable):
 
 
 class BitInt(object):
+    """ immutable integer of a given bit width """
     __slots__ = ("val", "width", "fmt", "signed")
 
     def __init__(self, val, width=32, signed=True):
@@ -21,10 +24,13 @@ class BitInt(object):
         if signed:
             if val & (1 << (width - 1)):
                 val = val - mask - 1
-        self.width = width
-        self.val = val
-        self.fmt = "%%0%dx" % ((self.width + 3) / 4)
-        self.signed = signed
+        object.__setattr__(self, "width", width)
+        object.__setattr__(self, "val", val)
+        object.__setattr__(self, "fmt", "%%0%dx" % ((width + 3) / 4))
+        object.__setattr__(self, "signed", signed)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is immutable" % type(self).__name__)
 
     def __str__(self):
         return self.fmt % self.val
@@ -43,16 +49,48 @@ class BitInt(object):
 
 
 class Imm(Operand, BitInt):
+    """ immediate operand, values in intern_range are shared instances """
+    __slots__ = ()
+    intern_range = range(-256, 256)
+    _interned = {}
+
+    def __new__(cls, val, width=32, signed=True):
+        key = (val, width, signed)
+        self = cls._interned.get(key)
+        if self is None:
+            self = super(Imm, cls).__new__(cls)
+            BitInt.__init__(self, val, width, signed)
+            if self.val in cls.intern_range:
+                cls._interned[key] = self
+        return self
+
+    def __init__(self, val, width=32, signed=True):
+        pass
+
     def __str__(self):
         return "%08x" % int(self)
 
 
 class EnumOperand(Operand):
+    """ operand holding an enum member, one shared instance per class and value """
     __slots__ = ("val",)
     enum_class = NotImplemented
 
-    def __init__(self, val):
-        self.val = self.enum_class(val)
+    def __init_subclass__(cls, **kw):
+        super().__init_subclass__(**kw)
+        cls._interned = {}
+
+    def __new__(cls, val):
+        key = int(val)
+        self = cls._interned.get(key)
+        if self is None:
+            self = super(EnumOperand, cls).__new__(cls)
+            object.__setattr__(self, "val", cls.enum_class(val))
+            cls._interned[key] = self
+        return self
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is immutable" % type(self).__name__)
 
     def __str__(self):
         return self.val.name
@@ -65,12 +103,18 @@ class EnumOperand(Operand):
 
 
 class Reg(EnumOperand):
+    __slots__ = ()
     enum_class = enums.REG
 
 
 class SReg(Operand):
+    __slots__ = ("reg_id",)
+
     def __init__(self, reg_id: int):
-        self.reg_id = reg_id
+        object.__setattr__(self, "reg_id", reg_id)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is immutable" % type(self).__name__)
 
     def __int__(self):
         return self.reg_id
@@ -80,27 +124,32 @@ class SReg(Operand):
 
 
 class Cond(EnumOperand):
+    __slots__ = ()
     enum_class = enums.COND
 
 
 class FCond(EnumOperand):
+    __slots__ = ()
     enum_class = enums.FCOND
 
 
 class Addressing(Operand):
-    pass
+    __slots__ = ()
 
 
 class JumpAddress(Addressing):
-    pass
+    __slots__ = ()
 
 
 class RelJump(JumpAddress, BitInt):
+    __slots__ = ()
+
     def __str__(self):
         return "PC%s%d" % ("+" if int(self) >= 0 else "", int(self))
 
 
 class RegJump(JumpAddress, EnumOperand):
+    __slots__ = ()
     enum_class = enums.REG
 
     def __str__(self):
@@ -111,11 +160,15 @@ class Displacement(Operand):
     __slots__ = ("disp", "base")
 
     def __init__(self, disp, base=0, width=32, signed=True):
-        self.base = enums.REG(base)
+        base = enums.REG(base)
         disp = BitInt(disp, width=width, signed=signed)
-        if self.base == enums.REG.R0:
+        if base == enums.REG.R0:
             disp = BitInt(int(disp), width=32, signed=False)
-        self.disp = disp
+        object.__setattr__(self, "base", base)
+        object.__setattr__(self, "disp", disp)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is immutable" % type(self).__name__)
 
     def __str__(self):
         if self.disp:
@@ -124,23 +177,26 @@ class Displacement(Operand):
             return "[%s]" % self.base.name
 
     def __eq__(self, other):
-        return self.disp == other.disp22 and self.base == other.base
+        return self.disp == other.disp and self.base == other.base
 
 
 class BasedJump(JumpAddress, Displacement):
-    pass
+    __slots__ = ()
 
 
 class VecJump(JumpAddress, BitInt):
+    __slots__ = ()
+
     def __init__(self, val, width=8):
         super(VecJump, self).__init__(val, width=width, signed=False)
 
 
 class MemoryAddress(Addressing):
-    pass
+    __slots__ = ()
 
 
 class RegMem(MemoryAddress, EnumOperand):
+    __slots__ = ()
     enum_class = enums.REG
 
     def __str__(self):
@@ -148,32 +204,39 @@ class RegMem(MemoryAddress, EnumOperand):
 
 
 class ImmMem(MemoryAddress, BitInt):
-    pass
+    __slots__ = ()
 
 
 class BasedMem(MemoryAddress, Displacement):
-    pass
+    __slots__ = ()
 
 
 class EpBasedMem(BasedMem):
+    __slots__ = ()
+
     def __init__(self, disp, width=7, signed=False):
         super(BasedMem, self).__init__(disp, enums.REG.EP, width=width, signed=signed)
 
 
 class BitMem(MemoryAddress, Displacement):
-    __slots__ = ("index", "disp", "base")
+    __slots__ = ("index",)
 
     def __init__(self, index, disp, base, width=32, signed=True):
         super(BitMem, self).__init__(disp, base, width, signed)
-        self.index = index
+        object.__setattr__(self, "index", index)
 
     def __str__(self):
         return "#%d, %d[%s]" % (self.index, int(self.disp), self.base.name)
 
 
 class RegList(Operand):
+    __slots__ = ("reg_list",)
+
     def __init__(self, reg_list):
-        self.reg_list = reg_list
+        object.__setattr__(self, "reg_list", reg_list)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is immutable" % type(self).__name__)
 
     def __str__(self):
         return "[%s]" % (", ".join(r.name for r in self.reg_list))
@@ -186,6 +249,8 @@ class RegList(Operand):
 
 
 class RegPair(Operand):
+    __slots__ = ("_regpair",)
+
     def __init__(self, reg_hi, reg_lo=None):
         if reg_lo is None:
             rh = int(reg_hi)
@@ -197,7 +262,10 @@ class RegPair(Operand):
                 reg_hi = enums.REG(rh)
                 reg_lo = enums.REG(rh - 1)
         # assert int(reg_hi) == int(reg_lo) + 1, "reg_hi, reg_lo=%s, %s" % (reg_hi, reg_lo)
-        self._regpair = (reg_hi, reg_lo)
+        object.__setattr__(self, "_regpair", (reg_hi, reg_lo))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is immutable" % type(self).__name__)
 
     def __iter__(self):
         return iter(self._regpair)
@@ -208,23 +276,33 @@ class RegPair(Operand):
 
     @property
     def reg_lo(self):
-        return self._regpair[0]
+        return self._regpair[1]
 
     def __str__(self):
         return "%s || %s" % (self.reg_hi.name, self.reg_lo.name)
 
 
 class RegRange(Operand):
+    """ the registers rh to rt of PUSHSP/POPSP, empty if rh > rt """
+    __slots__ = ("start", "stop")
+
     def __init__(self, rh, rt):
-        assert int(rt) >= int(rh)
-        self.start = enums.REG(rt)
-        self.stop = enums.REG(rh)
+        object.__setattr__(self, "start", enums.REG(rh))
+        object.__setattr__(self, "stop", enums.REG(rt))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("%s is immutable" % type(self).__name__)
+
+    def __iter__(self):
+        return (enums.REG(r) for r in range(int(self.start), int(self.stop) + 1))
 
     def __str__(self):
         return "%s-%s" % (self.start.name, self.stop.name)
 
 
 class CacheOp(EnumOperand):
+    __slots__ = ()
+    enum_class = enums.CACHEOP
     cacheop_map = {
         0x0: enums.CACHEOP.CHBII,
         0x20: enums.CACHEOP.CIBII,
@@ -234,24 +312,22 @@ class CacheOp(EnumOperand):
         0x7e: enums.CACHEOP.CLL,
     }
 
-    def __init__(self, cacheop):
-        super(CacheOp, self).__init__(self.cacheop_map.get(cacheop, enums.CACHEOP.INVALID))
-
+    def __new__(cls, cacheop):
+        return super(CacheOp, cls).__new__(cls, cls.cacheop_map.get(cacheop, enums.CACHEOP.INVALID))
 
-def __bool__(self):
-    return self.val != enums.CACHEOP.INVALID
+    def __bool__(self):
+        return self.val != enums.CACHEOP.INVALID
 
 
 class PrefOp(EnumOperand):
+    __slots__ = ()
+    enum_class = enums.PREFOP
     prefop_map = {
         0x0: enums.PREFOP.PREFI
     }
 
-    def __init__(self, prefop):
-        super(PrefOp, self).__init__(self.prefop_map.get(prefop, enums.PREFOP.INVALID))
-
-    def __str__(self):
-        return "%s" % self.prefop.name
+    def __new__(cls, prefop):
+        return super(PrefOp, cls).__new__(cls, cls.prefop_map.get(prefop, enums.PREFOP.INVALID))
 
     def __bool__(self):
         return self.val != enums.PREFOP.INVALID
@@ -0,0 +1,216 @@
+"""
+Static resolution of computed branches.
+
+The results are memoized per BinaryView and table address, views are keyed by hash(view)
+(their core handle) so that the caches do not keep them alive.
+"""
+import re
+from threading import Lock
+
+import binaryninja as bn
+
+from .cache import LRUCache
+from .enums import MNEM, REG, COND, Subarch
+from .opcode_table import decode_cached
+from .operand import Reg, Imm
+
+switch_tables = LRUCache(maxsize=0x1000)
+callt_tables = LRUCache(maxsize=0x40)
+
+# upper bound of the cases of a resolved SWITCH table
+MAX_SWITCH_CASES = 0x400
+
+
+def decode_at(view, addr, size, subarch: Subarch):
+    """ the instruction at addr if it is exactly size bytes long, else None
+
+    Extended opcodes (bits 10:5 all set) are not decoded, none of the patterns looked for here uses them.
+    """
+    data = view.read(addr, 8)
+    if len(data) < size or data[0] & 0xe0 == 0xe0 and data[1] & 0x07 == 0x07:
+        return None
+    insn = decode_cached(data, subarch=subarch)
+    if insn.length * 2 != size or insn.mnem == MNEM.INVALID_CODE:
+        return None
+    return insn
+
+
+def register_constant(view, addr, r: REG, subarch: Subarch, depth=2):
+    """ the value loaded into r by the instructions right before addr, None if it is not a known constant
+
+    Recognised are `mov imm5, r`, `mov imm32, r`, `movea imm16, r0, r`, `movhi imm16, r0, r`
+    and `movhi hi, r0, rY` + `movea lo, rY, r`.
+    """
+    insn = decode_at(view, addr - 2, 2, subarch)
+    if insn is not None and insn.mnem == MNEM.MOV:
+        src, dst = insn.operands
+        if isinstance(src, Imm) and dst.val == r:
+            return int(src) & 0xffffffff
+    insn = decode_at(view, addr - 6, 6, subarch)
+    if insn is not None and insn.mnem == MNEM.MOV:
+        src, dst = insn.operands
+        if isinstance(src, Imm) and dst.val == r:
+            return int(src) & 0xffffffff
+    insn = decode_at(view, addr - 4, 4, subarch)
+    if insn is not None and insn.mnem in (MNEM.MOVEA, MNEM.MOVHI):
+        imm, src, dst = insn.operands
+        if dst.val != r:
+            return None
+        value = int(imm) if insn.mnem == MNEM.MOVEA else int(imm) << 16
+        if src.val == REG.R0:
+            return value & 0xffffffff
+        if insn.mnem == MNEM.MOVEA and depth:
+            base = register_constant(view, addr - 4, src.val, subarch, depth - 1)
+            if base is not None:
+                return (base + value) & 0xffffffff
+    return None
+
+
+def switch_case_count(view, addr, r: REG, subarch: Subarch):
+    """ number of cases of `switch r` at addr from the bounds check right before it, 0 if there is none
+
+    The recognised check is `cmp bound, r` followed by `bh default` (cases 0..bound)
+    or `bnl default` (cases 0..bound-1), bound being an imm5 or a register loaded by register_constant().
+    """
+    br = decode_at(view, addr - 2, 2, subarch)
+    if br is None or br.mnem != MNEM.B or br.operands[0].val not in (COND.H, COND.NL):
+        return 0
+    cmp = decode_at(view, addr - 4, 2, subarch)
+    if cmp is None or cmp.mnem != MNEM.CMP:
+        return 0
+    bound, index = cmp.operands
+    if index.val != r:
+        return 0
+    if isinstance(bound, Reg):
+        bound = register_constant(view, addr - 4, bound.val, subarch)
+    else:
+        bound = int(bound)
+    if bound is None:
+        return 0
+    count = bound + 1 if br.operands[0].val == COND.H else bound
+    if not 0 < count <= MAX_SWITCH_CASES:
+        return 0
+    return count
+
+
+def read_switch_table(view, addr, count):
+    """ the distinct targets of the halfword table of the SWITCH at addr, in table order """
+    base = addr + 2
+    data = view.read(base, count * 2)
+    if len(data) != count * 2:
+        return ()
+    targets = {}
+    for i in range(0, len(data), 2):
+        targets[base + (int.from_bytes(data[i:i + 2], "little", signed=True) << 1)] = None
+    return tuple(targets)
+
+
+def resolve_switch(view, addr, r: REG, subarch: Subarch):
+    """ the targets of `switch r` at addr, () if its table cannot be bounded """
+    key = (hash(view), addr)
+    targets = switch_tables.get(key)
+    if targets is None:
+        count = switch_case_count(view, addr, r, subarch)
+        targets = read_switch_table(view, addr, count) if count else ()
+        switch_tables.put(key, targets)
+    return targets
+
+
+def report_indirect_branches(func, arch, addr, targets):
+    """ make targets the indirect branches of func at addr, unless they already are """
+    known = {branch.dest_addr for branch in func.get_indirect_branches_at(addr)}
+    if known != set(targets):
+        func.set_auto_indirect_branches(addr, [(arch, target) for target in targets])
+
+
+# indirect branches found while lifting, applied once the analysis of their view completes:
+# {hash(view): {(function start, addr): (arch, targets)}} and the pending completion event of each view
+pending_branches = {}
+completion_events = {}
+pending_lock = Lock()
+# (hash(view), function start, addr) -> targets already set on the function
+reported_branches = LRUCache(maxsize=0x1000)
+
+
+def queue_indirect_branches(func, arch, addr, targets):
+    """ report targets as the indirect branches of func at addr after the current analysis, once per table
+
+    Setting them from the lift callback would change the function while it is analyzed
+    and queue another pass on every lift.
+    """
+    view = func.view
+    key = hash(view)
+    if reported_branches.get((key, func.start, addr)) == targets:
+        return
+    with pending_lock:
+        pending_branches.setdefault(key, {})[(func.start, addr)] = (arch, targets)
+        if key not in completion_events:
+            completion_events[key] = bn.AnalysisCompletionEvent(view, flush_indirect_branches)
+
+
+def flush_indirect_branches(event):
+    """ AnalysisCompletionEvent callback setting the queued indirect branches of event.view """
+    view = event.view
+    key = hash(view)
+    with pending_lock:
+        completion_events.pop(key, None)
+        pending = pending_branches.pop(key, {})
+    for (start, addr), (arch, targets) in pending.items():
+        func = view.get_function_at(start, arch)
+        if func is not None:
+            report_indirect_branches(func, arch, addr, targets)
+        reported_branches.put((key, start, addr), targets)
+
+
+# ldsr rX, ctbp: rrrrr111111RRRRR 0000000000100000 with rrrrr = 20 (the system register) and RRRRR = X
+LDSR_CTBP = re.compile(rb"[\xe0-\xff]\xa7\x20\x00")
+SREG_CTBP = 20
+
+
+def find_ctbp(view, subarch: Subarch):
+    """ the CALLT base of view, None if it is unknown or ambiguous
+
+    It is taken from the "v850_ctbp" metadata of the view if present, else from the constants
+    loaded into ctbp by every `ldsr rX, ctbp` in the executable segments.
+    """
+    try:
+        return int(view.query_metadata("v850_ctbp"))
+    except KeyError:
+        pass
+    values = set()
+    for seg in view.segments:
+        if not seg.executable:
+            continue
+        data = view.read(seg.start, seg.data_length)
+        for match in LDSR_CTBP.finditer(data):
+            if match.start() & 1:
+                continue
+            addr = seg.start + match.start()
+            values.add(register_constant(view, addr, REG(data[match.start()] & 0x1f), subarch))
+    if len(values) != 1:
+        return None
+    return values.pop()
+
+
+def read_callt_table(view, ctbp):
+    """ the 64 CALLT targets of the table at ctbp """
+    data = view.read(ctbp, 0x80)
+    if len(data) != 0x80:
+        return ()
+    return tuple((ctbp + int.from_bytes(data[i:i + 2], "little")) & 0xffffffff for i in range(0, 0x80, 2))
+
+
+def resolve_callt(view, index, subarch: Subarch):
+    """ the target of `callt index` in view, None if the CALLT table is unknown
+
+    The table is looked up once per view, callt_tables.clear() forgets it, e.g. after setting "v850_ctbp".
+    """
+    key = hash(view)
+    targets = callt_tables.get(key)
+    if targets is None:
+        ctbp = find_ctbp(view, subarch)
+        targets = read_callt_table(view, ctbp) if ctbp is not None else ()
+        callt_tables.put(key, targets)
+    if not targets:
+        return None
+    return targets[index]
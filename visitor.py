@@ -1,5 +1,21 @@
+class VisitorType(type):
+    """ drops the resolved visit methods when a visitor class is changed """
+    def __setattr__(cls, name, value):
+        super().__setattr__(name, value)
+        Visitable.visit_methods.clear()
+
+    def __delattr__(cls, name):
+        super().__delattr__(name)
+        Visitable.visit_methods.clear()
+
+
 class Visitable(object):
-    class Visitor(object):
+    __slots__ = ()
+
+    # (visitor class, visitable class) -> visit function, None if there is none
+    visit_methods = {}
+
+    class Visitor(object, metaclass=VisitorType):
         def visit_Visitable(self, obj, *args, **kwargs):
             return NotImplemented
 
@@ -11,12 +27,22 @@ class Visitable(object):
     def get_visit_method(cls, vis, default=None):
         return getattr(vis, cls.visit_method_name(), default)
 
-    def accept(self, vis, *args, **kwargs):
+    @classmethod
+    def resolve_visit_method(cls, vis_cls):
+        """ the visit method of the most derived Visitable base vis_cls has one for """
         meth = None
-        for c in reversed(self.__class__.mro()):
+        for c in reversed(cls.mro()):
             if issubclass(c, Visitable):
-                meth = c.get_visit_method(vis, meth)
+                meth = c.get_visit_method(vis_cls, meth)
+        return meth
+
+    def accept(self, vis, *args, **kwargs):
+        key = (vis.__class__, self.__class__)
+        try:
+            meth = Visitable.visit_methods[key]
+        except KeyError:
+            meth = Visitable.visit_methods[key] = self.__class__.resolve_visit_method(vis.__class__)
         if meth:
-            return meth(self, *args, **kwargs)
+            return meth(vis, self, *args, **kwargs)
         else:
             return NotImplemented